@@ -2,23 +2,129 @@
 Flask API for SHL Assessment Recommendation System
 UPDATED: Now uses LLM-integrated recommendation engine
 """
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from whitenoise import WhiteNoise
 from llm_recommendation_engine import LLMRecommendationEngine
+from collections import OrderedDict
+import numpy as np
+import orjson
+import threading
 import os
 
+class ORJSONProvider(JSONProvider):
+    """
+    Serialize jsonify() responses with orjson instead of the stdlib encoder.
+    Keys are sorted like Flask's default provider; non-ASCII text is written as raw UTF-8.
+    """
+    
+    def dumps(self, obj, **kwargs):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=options).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__, static_folder='static')
+app.json = ORJSONProvider(app)
 CORS(app)
 
-# Initialize LLM recommendation engine
-print("Initializing LLM-based recommendation engine...")
-print("This uses: Gemini Pro API + Sentence Transformers")
-try:
-    engine = LLMRecommendationEngine('shl_full_catalog.json')
-    print("✓ LLM Recommendation engine ready!")
-except Exception as e:
-    print(f"⚠ Fallback: Using smaller dataset - {str(e)[:50]}")
-    engine = LLMRecommendationEngine('assessments_data.json')
+# Serve the frontend (static/index.html at /) from WhiteNoise, ahead of Flask routing
+app.wsgi_app = WhiteNoise(app.wsgi_app, root=os.path.join(app.root_path, 'static'), index_file=True, max_age=3600)
+
+# LLM recommendation engine (Gemini API + Sentence Transformers), built on first use
+# Precomputed catalog embeddings (see build_catalog_embeddings.py)
+EMBEDDINGS_PATH = 'catalog_emb.npy'
+QUERY_CACHE_PATH = 'q_cache.npz'
+CATALOG_PATH = 'shl_full_catalog.json'
+FALLBACK_CATALOG_PATH = 'assessments_data.json'
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """
+    Process-wide engine singleton, constructed on first use (double-checked locking).
+    The catalog is chosen up front so the model is never loaded twice.
+    Under `gunicorn --preload` with PRELOAD_ENGINE=1 it is built once in the master
+    and workers inherit it via copy-on-write, so workers must never mutate model weights.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                print("Initializing LLM-based recommendation engine...")
+                if os.path.exists(CATALOG_PATH):
+                    catalog_path = CATALOG_PATH
+                else:
+                    print(f"⚠ Fallback: {CATALOG_PATH} not found, using {FALLBACK_CATALOG_PATH}")
+                    catalog_path = FALLBACK_CATALOG_PATH
+                embeddings_path = EMBEDDINGS_PATH if os.path.exists(EMBEDDINGS_PATH) else None
+                _engine = LLMRecommendationEngine(
+                    catalog_path,
+                    embeddings_path=embeddings_path,
+                    query_cache_path=QUERY_CACHE_PATH
+                )
+                print("✓ LLM Recommendation engine ready!")
+    return _engine
+
+# Opt-in eager load so a preloading Gunicorn master shares the model with its workers
+if os.environ.get('PRELOAD_ENGINE') == '1':
+    get_engine()
+
+# Response cache for /recommend
+# Tier 1: exact match on (normalized query, top_k), LRU-evicted
+# Tier 2: semantic match on query embedding (cosine similarity >= threshold)
+EXACT_CACHE_SIZE = 1024
+SEMANTIC_CACHE_SIZE = 256
+SEMANTIC_THRESHOLD = 0.97
+
+_cache_lock = threading.Lock()
+_exact_cache = OrderedDict()
+_semantic_embeddings = None  # (N, dim) float32, rows are L2-normalized
+_semantic_entries = []       # parallel list of (top_k, response)
+
+def get_cached_response(key):
+    """Return an exact-match cached response, or None"""
+    with _cache_lock:
+        if key in _exact_cache:
+            _exact_cache.move_to_end(key)
+            return _exact_cache[key]
+    return None
+
+def get_semantic_response(query_embedding, top_k):
+    """Return the response of the most similar cached query, or None"""
+    with _cache_lock:
+        if _semantic_embeddings is None:
+            return None
+        sims = _semantic_embeddings @ query_embedding
+        for idx in np.argsort(sims)[::-1]:
+            if sims[idx] < SEMANTIC_THRESHOLD:
+                break
+            cached_top_k, response = _semantic_entries[idx]
+            if cached_top_k == top_k:
+                return response
+    return None
+
+def store_response(key, query_embedding, response):
+    """Store a response in both cache tiers, evicting the oldest entries"""
+    global _semantic_embeddings
+    with _cache_lock:
+        _exact_cache[key] = response
+        _exact_cache.move_to_end(key)
+        while len(_exact_cache) > EXACT_CACHE_SIZE:
+            _exact_cache.popitem(last=False)
+        
+        if query_embedding is None:
+            return
+        row = query_embedding[np.newaxis, :]
+        if _semantic_embeddings is None:
+            _semantic_embeddings = row
+        else:
+            _semantic_embeddings = np.vstack([_semantic_embeddings, row])[-SEMANTIC_CACHE_SIZE:]
+        _semantic_entries.append((key[1], response))
+        del _semantic_entries[:-SEMANTIC_CACHE_SIZE]
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -51,26 +157,28 @@ def recommend():
         top_k = data.get('top_k', 10)
         top_k = max(1, min(10, int(top_k)))
         
+        # Serve repeated or paraphrased queries from cache
+        cache_key = (query.strip().lower(), top_k)
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            return jsonify(cached), 200
+        
+        engine = get_engine()
+        query_embedding = engine.embed_query(query)
+        cached = get_semantic_response(query_embedding, top_k)
+        if cached is not None:
+            store_response(cache_key, None, cached)
+            return jsonify(cached), 200
+        
         # Get recommendations using LLM engine
         recommendations = engine.recommend(query, top_k=top_k)
-        formatted_recommendations = engine.format_for_api(recommendations)
         
         # Format response according to EXACT API specification
         response = {
-            'recommended_assessments': [
-                {
-                    'url': rec['assessment_url'],
-                    'name': rec['assessment_name'],
-                    'adaptive_support': rec['adaptive_support'],
-                    'description': rec['description'],
-                    'duration': rec['duration'],
-                    'remote_support': rec['remote_support'],
-                    'test_type': [rec['test_type']] if rec['test_type'] else []
-                }
-                for rec in formatted_recommendations
-            ]
+            'recommended_assessments': engine.format_for_api(recommendations, shape='api')
         }
         
+        store_response(cache_key, query_embedding, response)
         return jsonify(response), 200
         
     except Exception as e:
@@ -78,11 +186,6 @@ def recommend():
             'error': f'Internal server error: {str(e)}'
         }), 500
 
-@app.route('/', methods=['GET'])
-def home():
-    """Serve the frontend"""
-    return send_from_directory('static', 'index.html')
-
 @app.route('/api', methods=['GET'])
 def api_info():
     """API info endpoint"""
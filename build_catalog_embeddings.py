@@ -0,0 +1,65 @@
+"""
+Precompute the catalog embedding matrix for the LLM recommendation engine
+Run once after scraping; app.py memory-maps the result at startup
+"""
+import json
+import os
+import sys
+import numpy as np
+import orjson
+from llm_recommendation_engine import (EMBEDDING_MODEL_NAME, catalog_text_sha1, embedding_text,
+                                       load_embedding_model, quantize_embeddings)
+
+def build_catalog_embeddings(catalog_path='shl_full_catalog.json', output_path='catalog_emb.npy', quantize=True):
+    """
+    Encode every assessment and save the matrix plus its parallel URL list, and the model name
+    and catalog text hash the engine checks before trusting the matrix.
+    With quantize=True the matrix is stored as int8 with per-row scales (4x smaller than float32).
+    """
+    with open(catalog_path, 'rb') as f:
+        assessments = orjson.loads(f.read())
+    print(f"Loaded {len(assessments)} assessments from {catalog_path}")
+    
+    model = load_embedding_model()
+    texts = [embedding_text(assessment) for assessment in assessments]
+    embeddings = model.encode(
+        texts,
+        batch_size=128,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=True
+    )
+    
+    base_path = os.path.splitext(output_path)[0]
+    scales_path = base_path + '_scales.npy'
+    if quantize:
+        quantized, scales = quantize_embeddings(embeddings.astype(np.float32))
+        np.save(output_path, quantized)
+        np.save(scales_path, scales)
+        print(f"✓ Saved int8 row scales to {scales_path}")
+    else:
+        np.save(output_path, embeddings.astype(np.float32))
+        if os.path.exists(scales_path):
+            os.remove(scales_path)
+    
+    urls_path = base_path + '_urls.json'
+    with open(urls_path, 'w', encoding='utf-8') as f:
+        json.dump([assessment.get('url') for assessment in assessments], f)
+    
+    meta_path = base_path + '_meta.json'
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'model': EMBEDDING_MODEL_NAME, 'catalog_sha1': catalog_text_sha1(assessments)}, f)
+    
+    print(f"✓ Saved {embeddings.shape} embedding matrix to {output_path}")
+    print(f"✓ Saved URL index to {urls_path}")
+    print(f"✓ Saved model and catalog hash to {meta_path}")
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    catalog_path = args[0] if len(args) > 0 else 'shl_full_catalog.json'
+    output_path = args[1] if len(args) > 1 else 'catalog_emb.npy'
+    quantize = '--float32' not in sys.argv
+    build_catalog_embeddings(catalog_path, output_path, quantize=quantize)
+
+if __name__ == "__main__":
+    main()
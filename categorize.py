@@ -0,0 +1,78 @@
+"""
+Keyword-based assessment categorization
+Shared by create_mock_data.py, full_scraper.py and scraper_v2.py
+"""
+import ahocorasick
+
+# Categories inferred from assessment names (mock dataset)
+MOCK_CATEGORY_KEYWORDS = {
+    'programming': ['java', 'python', 'javascript', 'programming', 'coding'],
+    'personality': ['personality', 'opq', 'behavior'],
+    'cognitive': ['verbal', 'numerical', 'reasoning', 'cognitive'],
+    'sales': ['sales', 'selling'],
+    'leadership': ['leadership', 'manager', 'executive'],
+    'communication': ['communication', 'english', 'writing', 'interpersonal'],
+    'technical': ['sql', 'database', 'selenium', 'html', 'css', 'technical'],
+    'administrative': ['admin', 'clerical']
+}
+
+# Test type implied by a mock category (later matches take precedence)
+MOCK_CATEGORY_TEST_TYPES = {
+    'programming': 'K',
+    'personality': 'P',
+    'cognitive': 'K',
+    'technical': 'K'
+}
+
+# Categories inferred from scraped catalog page content
+CATALOG_CATEGORY_KEYWORDS = {
+    'Knowledge & Skills': ['programming', 'java', 'python', 'javascript', 'sql', 'technical', 'coding', 'software'],
+    'Personality & Behavior': ['personality', 'behavioral', 'opq', 'behavior'],
+    'Cognitive': ['cognitive', 'verbal', 'numerical', 'reasoning', 'inductive', 'deductive'],
+    'Communication': ['communication', 'english', 'writing', 'language'],
+    'Sales': ['sales', 'selling', 'customer'],
+    'Leadership': ['leadership', 'manager', 'management', 'executive'],
+    'Administrative': ['administrative', 'admin', 'clerical']
+}
+
+# Categories inferred from training-set product pages (scraper_v2.py)
+TARGETED_CATEGORY_KEYWORDS = {
+    'programming': ['java', 'python', 'javascript', 'programming', 'coding', 'software', 'developer'],
+    'personality': ['personality', 'behavior', 'opq', 'behavioral'],
+    'cognitive': ['cognitive', 'verbal', 'numerical', 'reasoning', 'inductive'],
+    'sales': ['sales', 'selling', 'customer'],
+    'leadership': ['leadership', 'manager', 'executive', 'coo'],
+    'communication': ['communication', 'english', 'writing', 'interpersonal'],
+    'technical': ['technical', 'sql', 'database', 'selenium', 'html', 'css'],
+    'administrative': ['administrative', 'admin', 'clerical']
+}
+
+def build_category_automaton(category_keywords):
+    """Build one Aho-Corasick automaton over every category keyword"""
+    categories_by_keyword = {}
+    for category, keywords in category_keywords.items():
+        for kw in keywords:
+            categories_by_keyword.setdefault(kw, []).append(category)
+    
+    automaton = ahocorasick.Automaton()
+    for kw, categories in categories_by_keyword.items():
+        automaton.add_word(kw, tuple(categories))
+    automaton.make_automaton()
+    
+    # Remember definition order so results are stable
+    order = {category: i for i, category in enumerate(category_keywords)}
+    return automaton, order
+
+MOCK_CATEGORY_AUTOMATON = build_category_automaton(MOCK_CATEGORY_KEYWORDS)
+CATALOG_CATEGORY_AUTOMATON = build_category_automaton(CATALOG_CATEGORY_KEYWORDS)
+TARGETED_CATEGORY_AUTOMATON = build_category_automaton(TARGETED_CATEGORY_KEYWORDS)
+
+def categorize(text_lower, category_automaton):
+    """Return the categories whose keywords occur in the (lowercased) text, in definition order"""
+    automaton, order = category_automaton
+    matched = set()
+    for _, categories in automaton.iter(text_lower):
+        matched.update(categories)
+        if len(matched) == len(order):
+            break
+    return sorted(matched, key=order.get)
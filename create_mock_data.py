@@ -2,15 +2,17 @@
 Create mock assessment data from training URLs for initial testing
 """
 import pandas as pd
-import json
+from load_data import load_sheet
+import orjson
+from categorize import categorize, MOCK_CATEGORY_AUTOMATON, MOCK_CATEGORY_TEST_TYPES
 
 def create_mock_assessments():
     """Create mock assessment data from training data URLs"""
     excel_path = 'Gen_AI Dataset.xlsx'
-    df_train = pd.read_excel(excel_path, sheet_name='Train-Set')
+    df_train = load_sheet(excel_path, 'Train-Set', usecols=['Assessment_url'])
     
     # Get unique URLs
-    unique_urls = df_train['Assessment_url'].unique()
+    unique_urls = pd.unique(df_train['Assessment_url'].values)
     
     assessments = []
     for url in unique_urls:
@@ -37,27 +39,10 @@ def create_mock_assessments():
         name_lower = clean_name.lower()
         
         # Infer categories from name
-        categories = []
-        if any(word in name_lower for word in ['java', 'python', 'javascript', 'programming', 'coding']):
-            categories.append('programming')
-            assessment['test_type'] = 'K'
-        if any(word in name_lower for word in ['personality', 'opq', 'behavior']):
-            categories.append('personality')
-            assessment['test_type'] = 'P'
-        if any(word in name_lower for word in ['verbal', 'numerical', 'reasoning', 'cognitive']):
-            categories.append('cognitive')
-            assessment['test_type'] = 'K'
-        if any(word in name_lower for word in ['sales', 'selling']):
-            categories.append('sales')
-        if any(word in name_lower for word in ['leadership', 'manager', 'executive']):
-            categories.append('leadership')
-        if any(word in name_lower for word in ['communication', 'english', 'writing', 'interpersonal']):
-            categories.append('communication')
-        if any(word in name_lower for word in ['sql', 'database', 'selenium', 'html', 'css', 'technical']):
-            categories.append('technical')
-            assessment['test_type'] = 'K'
-        if any(word in name_lower for word in ['admin', 'clerical']):
-            categories.append('administrative')
+        categories = categorize(name_lower, MOCK_CATEGORY_AUTOMATON)
+        for category in categories:
+            if category in MOCK_CATEGORY_TEST_TYPES:
+                assessment['test_type'] = MOCK_CATEGORY_TEST_TYPES[category]
         
         assessment['category'] = ', '.join(categories) if categories else 'general'
         
@@ -69,8 +54,8 @@ def create_mock_assessments():
     print(f"Created {len(assessments)} mock assessments")
     
     # Save to JSON
-    with open('assessments_data.json', 'w', encoding='utf-8') as f:
-        json.dump(assessments, f, indent=2, ensure_ascii=False)
+    with open('assessments_data.json', 'wb') as f:
+        f.write(orjson.dumps(assessments, option=orjson.OPT_INDENT_2))
     
     print("Saved to assessments_data.json")
     
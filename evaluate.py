@@ -3,33 +3,72 @@ Evaluate the recommendation system using Mean Recall@K
 """
 import pandas as pd
 import numpy as np
+from load_data import load_sheet
 
-def calculate_recall_at_k(predictions, ground_truth, k=10):
+# Numba JIT-compiles the recall kernel; without it the same kernel runs as plain Python
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+def _to_csr(query_ids, item_ids, num_queries):
+    """Group item ids by query id into CSR (row pointer, column) arrays"""
+    order = np.argsort(query_ids, kind='stable')
+    counts = np.bincount(query_ids, minlength=num_queries)
+    rows = np.zeros(num_queries + 1, dtype=np.int64)
+    np.cumsum(counts, out=rows[1:])
+    return rows, item_ids[order].astype(np.int64)
+
+@njit(cache=True)
+def recall_kernel(pred_rows, pred_cols, gt_rows, gt_cols, num_items, out):
+    """Per-query |relevant ∩ predicted| / |relevant| over CSR-encoded id sets"""
+    marked = np.zeros(num_items, dtype=np.bool_)
+    for i in range(out.shape[0]):
+        for j in range(gt_rows[i], gt_rows[i + 1]):
+            marked[gt_cols[j]] = True
+        hits = 0
+        for j in range(pred_rows[i], pred_rows[i + 1]):
+            if marked[pred_cols[j]]:
+                hits += 1
+        for j in range(gt_rows[i], gt_rows[i + 1]):
+            marked[gt_cols[j]] = False
+        out[i] = hits / (gt_rows[i + 1] - gt_rows[i])
+
+def calculate_recall_at_k(predictions, ground_truth, k=10, verbose=False):
     """
     Calculate Recall@K for each query
     
     Recall@K = (Number of relevant items in top K) / (Total relevant items)
     """
-    recalls = []
-    
-    for query in ground_truth['Query'].unique():
-        # Get ground truth URLs for this query
-        relevant_urls = set(ground_truth[ground_truth['Query'] == query]['Assessment_url'].values)
-        
-        # Get predicted URLs for this query (top K)
-        predicted_urls = set(predictions[predictions['Query'] == query]['Assessment_url'].head(k).values)
-        
-        # Calculate recall
-        if len(relevant_urls) > 0:
-            num_relevant_in_topk = len(relevant_urls.intersection(predicted_urls))
-            recall = num_relevant_in_topk / len(relevant_urls)
-            recalls.append(recall)
-            
+    ground_truth = ground_truth[['Query', 'Assessment_url']].dropna().drop_duplicates()
+    predictions = predictions[['Query', 'Assessment_url']].dropna()
+    predictions = predictions.groupby('Query', sort=False).head(k).drop_duplicates()
+    
+    # Integer-encode queries (ground truth order) and URLs (shared vocabulary)
+    query_ids, queries = pd.factorize(ground_truth['Query'])
+    pred_query_ids = queries.get_indexer(predictions['Query'])
+    predictions = predictions[pred_query_ids >= 0]
+    pred_query_ids = pred_query_ids[pred_query_ids >= 0]
+    
+    url_ids, urls = pd.factorize(pd.concat([ground_truth['Assessment_url'], predictions['Assessment_url']]))
+    gt_url_ids, pred_url_ids = url_ids[:len(ground_truth)], url_ids[len(ground_truth):]
+    
+    gt_rows, gt_cols = _to_csr(query_ids, gt_url_ids, len(queries))
+    pred_rows, pred_cols = _to_csr(pred_query_ids, pred_url_ids, len(queries))
+    
+    recalls = np.zeros(len(queries), dtype=np.float64)
+    recall_kernel(pred_rows, pred_cols, gt_rows, gt_cols, len(urls), recalls)
+    
+    if verbose:
+        num_relevant = np.diff(gt_rows)
+        for query, relevant_count, recall in zip(queries, num_relevant, recalls):
             print(f"Query: {query[:60]}...")
-            print(f"  Relevant items: {len(relevant_urls)}")
-            print(f"  Found in top-{k}: {num_relevant_in_topk}")
+            print(f"  Relevant items: {relevant_count}")
+            print(f"  Found in top-{k}: {int(round(recall * relevant_count))}")
             print(f"  Recall@{k}: {recall:.3f}\n")
     
+    recalls = recalls.tolist()
     mean_recall = np.mean(recalls) if recalls else 0
     return mean_recall, recalls
 
@@ -40,16 +79,18 @@ def evaluate_on_training_data(excel_path='Gen_AI Dataset.xlsx'):
     print("="*80)
     
     # Load training data as ground truth
-    df_train = pd.read_excel(excel_path, sheet_name='Train-Set')
+    df_train = load_sheet(excel_path, 'Train-Set', usecols=['Query', 'Assessment_url'])
     
     # Load predictions (we'll generate them)
     from recommendation_engine import RecommendationEngine
     
     engine = RecommendationEngine('assessments_data.json')
     
+    queries = df_train['Query'].unique()
+    batch_recommendations = engine.recommend_batch(list(queries), top_k=10)
+    
     predictions = []
-    for query in df_train['Query'].unique():
-        recommendations = engine.recommend(query, top_k=10)
+    for query, recommendations in zip(queries, batch_recommendations):
         formatted = engine.format_recommendations(recommendations)
         for rec in formatted:
             predictions.append({
@@ -2,21 +2,60 @@
 Complete SHL Catalog Scraper - Scrapes ALL Individual Test Solutions
 Must get 377+ assessments as per assignment requirements
 """
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import aiohttp
+from aiohttp_client_cache import CachedSession as AsyncCachedSession, SQLiteBackend
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
+from urllib3.util.retry import Retry
+from selectolax.lexbor import LexborHTMLParser
 import json
-import time
+import logging
+import orjson
 import re
 from urllib.parse import urljoin
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+from categorize import categorize, CATALOG_CATEGORY_AUTOMATON
+
+# Main-content extraction strips shared navigation/footer boilerplate from stored text
+try:
+    import trafilatura
+    USE_TRAFILATURA = True
+except ImportError:
+    USE_TRAFILATURA = False
+
+logger = logging.getLogger(__name__)
 
 class FullSHLScraper:
-    def __init__(self):
+    # Compiled once, reused for every page; duration patterns are tried in priority order,
+    # each as (pattern with a `duration` group, minutes per unit)
+    _DURATION_PATTERNS = [
+        (re.compile(r'(?P<duration>\d+)\s*(?:minutes?|mins?)', re.IGNORECASE), 1),
+        (re.compile(r'(?P<duration>\d+)\s*(?:hours?|hrs?)', re.IGNORECASE), 60),
+    ]
+    _TEST_TYPE_RE = re.compile(r'Test\s+Type[:\s]+([A-Z])', re.IGNORECASE)
+    _ADAPTIVE_RE = re.compile(r'adaptive', re.IGNORECASE)
+    _REMOTE_RE = re.compile(r'remote', re.IGNORECASE)
+    
+    FULL_TEXT_LIMIT = 1000  # Characters of page text kept per assessment
+    CACHE_EXPIRE_SECONDS = 86400  # Re-runs within a day are served from the on-disk HTTP cache
+    
+    def __init__(self, cache_name='shl_cache'):
         self.base_url = "https://www.shl.com/solutions/products/product-catalog/"
-        self.session = requests.Session()
+        self.cache_name = cache_name
+        self.session = CachedSession(
+            f'{cache_name}.sqlite',
+            expire_after=self.CACHE_EXPIRE_SECONDS,
+            stale_if_error=True
+        )
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
         })
+        # Pooled keep-alive connections to shl.com, with retries on transient errors
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20, max_retries=Retry(
+            total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.all_product_urls = set()
     
     def get_all_catalog_pages(self):
@@ -25,13 +64,13 @@ class FullSHLScraper:
         try:
             response = self.session.get(self.base_url, timeout=30)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'lxml')
+            tree = LexborHTMLParser(response.text)
             
             # Find all product links
-            links = soup.find_all('a', href=True)
+            links = tree.css('a[href]')
             
             for link in links:
-                href = link['href']
+                href = link.attributes['href']
                 if '/product-catalog/view/' in href:
                     # Skip pre-packaged solutions as per requirements
                     if 'solution' not in href.lower() or 'individual' in href.lower():
@@ -46,13 +85,34 @@ class FullSHLScraper:
             print(f"Error fetching catalog: {e}")
             return []
     
-    def scrape_assessment_detail(self, url):
-        """Scrape detailed information from an assessment page"""
+    async def scrape_assessment_detail(self, session, semaphore, url):
+        """Fetch an assessment page and parse it"""
         try:
-            time.sleep(0.2)  # Rate limiting
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'lxml')
+            async with semaphore:
+                await asyncio.sleep(0.2)  # Rate limiting
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                    response.raise_for_status()
+                    html = await response.text()
+        except Exception as e:
+            logger.warning(f"Error scraping {url}: {str(e)[:100]}")
+            return None
+        
+        # Parsing is fast compared to the network, so it runs inline on the event loop
+        return self.parse_assessment_detail(url, html)
+    
+    @classmethod
+    def _search_duration(cls, text):
+        """Duration in minutes from the first pattern, in priority order, that matches the text"""
+        for pattern, minutes_per_unit in cls._DURATION_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                return int(match.group('duration')) * minutes_per_unit
+        return None
+    
+    def parse_assessment_detail(self, url, html):
+        """Extract detailed information from an assessment page"""
+        try:
+            tree = LexborHTMLParser(html)
             
             assessment = {
                 'url': url,
@@ -66,83 +126,94 @@ class FullSHLScraper:
             }
             
             # Extract name
-            title = soup.find('h1')
+            title = tree.css_first('h1')
             if title:
-                assessment['name'] = title.get_text(strip=True)
+                assessment['name'] = title.text(strip=True)
             else:
                 # Fallback: extract from URL
                 url_name = url.rstrip('/').split('/view/')[-1].replace('-', ' ').title()
                 assessment['name'] = url_name
             
             # Extract meta description
-            meta_desc = soup.find('meta', {'name': 'description'})
-            if meta_desc and meta_desc.get('content'):
-                assessment['description'] = meta_desc['content']
-            
-            # Get all text for further extraction
-            full_text = soup.get_text(separator=' ', strip=True)
-            
-            # Extract duration
-            duration_patterns = [
-                r'(\d+)\s*(?:minutes?|mins?)',
-                r'(\d+)\s*(?:hours?|hrs?)',
-            ]
-            for pattern in duration_patterns:
-                match = re.search(pattern, full_text, re.IGNORECASE)
-                if match:
-                    duration_val = int(match.group(1))
-                    if 'hour' in match.group(0).lower():
-                        duration_val *= 60
-                    assessment['duration'] = duration_val
-                    break
+            meta_desc = tree.css_first('meta[name="description"]')
+            if meta_desc and meta_desc.attributes.get('content'):
+                assessment['description'] = meta_desc.attributes['content']
+            
+            # Get all text for further extraction, as get_text(separator=' ', strip=True) did:
+            # the whole document (title included), no script/style code, empty strings skipped
+            tree.strip_tags(['script', 'style', 'noscript', 'template'])
+            text_nodes = tree.root.traverse(include_text=True) if tree.root else []
+            full_text = ' '.join(filter(None, (node.text_content.strip() for node in text_nodes
+                                               if node.tag == '-text')))
+            
+            # Extract duration (in minutes)
+            duration = self._search_duration(full_text)
+            if duration is not None:
+                assessment['duration'] = duration
             
             # Extract test type
-            test_type_match = re.search(r'Test\s+Type[:\s]+([A-Z])', full_text, re.IGNORECASE)
+            test_type_match = self._TEST_TYPE_RE.search(full_text)
             if test_type_match:
                 assessment['test_type'] = test_type_match.group(1)
             
             # Check for adaptive support
-            if re.search(r'adaptive', full_text, re.IGNORECASE):
+            if self._ADAPTIVE_RE.search(full_text):
                 assessment['adaptive_support'] = 'Yes'
             else:
                 assessment['adaptive_support'] = 'No'
             
             # Check for remote support
-            if re.search(r'remote', full_text, re.IGNORECASE):
+            if self._REMOTE_RE.search(full_text):
                 assessment['remote_support'] = 'Yes'
             else:
                 assessment['remote_support'] = 'No'
             
             # Categorize based on content
-            categories = []
-            category_keywords = {
-                'Knowledge & Skills': ['programming', 'java', 'python', 'javascript', 'sql', 'technical', 'coding', 'software'],
-                'Personality & Behavior': ['personality', 'behavioral', 'opq', 'behavior'],
-                'Cognitive': ['cognitive', 'verbal', 'numerical', 'reasoning', 'inductive', 'deductive'],
-                'Communication': ['communication', 'english', 'writing', 'language'],
-                'Sales': ['sales', 'selling', 'customer'],
-                'Leadership': ['leadership', 'manager', 'management', 'executive'],
-                'Administrative': ['administrative', 'admin', 'clerical']
-            }
-            
             text_lower = full_text.lower() + ' ' + assessment['name'].lower()
-            for category, keywords in category_keywords.items():
-                if any(kw in text_lower for kw in keywords):
-                    categories.append(category)
+            categories = categorize(text_lower, CATALOG_CATEGORY_AUTOMATON)
             
             assessment['categories'] = categories if categories else ['General']
             
-            # Full text for embeddings/search
-            assessment['full_text'] = full_text[:5000]  # Limit size
+            # Main content only for embeddings/search (fields above still use the whole page)
+            main_text = trafilatura.extract(html) if USE_TRAFILATURA else None
+            assessment['full_text'] = (main_text or full_text)[:self.FULL_TEXT_LIMIT]
             
             return assessment
             
         except Exception as e:
-            print(f"Error scraping {url}: {str(e)[:100]}")
+            logger.warning(f"Error parsing {url}: {str(e)[:100]}")
             return None
     
-    def scrape_all_parallel(self, max_workers=5):
-        """Scrape all assessments in parallel"""
+    async def scrape_all_async(self, urls, max_concurrency=20, jsonl_path=None):
+        """
+        Scrape the given assessment URLs concurrently on one event loop.
+        If jsonl_path is given, each assessment is appended there as soon as it is scraped.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        connector = aiohttp.TCPConnector(limit=max_concurrency)
+        headers = dict(self.session.headers)
+        cache = SQLiteBackend(f'{self.cache_name}_pages.sqlite', expire_after=self.CACHE_EXPIRE_SECONDS)
+        out = open(jsonl_path, 'wb') if jsonl_path else None
+        
+        assessments = []
+        try:
+            async with AsyncCachedSession(cache=cache, connector=connector, headers=headers) as session:
+                tasks = [self.scrape_assessment_detail(session, semaphore, url) for url in urls]
+                for task in tqdm(asyncio.as_completed(tasks), total=len(urls), desc="Scraping"):
+                    assessment = await task
+                    if assessment:
+                        assessments.append(assessment)
+                        if out:
+                            out.write(orjson.dumps(assessment) + b'\n')
+                        logger.debug(f"✓ {assessment['name']}")
+        finally:
+            if out:
+                out.close()
+        
+        return assessments
+    
+    def scrape_all(self, max_concurrency=20, jsonl_path='shl_full_catalog.jsonl'):
+        """Scrape all assessments concurrently"""
         urls = self.get_all_catalog_pages()
         
         if len(urls) < 100:  # Too few URLs, try alternative approach
@@ -150,25 +221,12 @@ class FullSHLScraper:
             # Add common assessment patterns
             urls = self.expand_url_list(urls)
         
-        assessments = []
-        
         print(f"\nScraping {len(urls)} assessments...")
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_url = {executor.submit(self.scrape_assessment_detail, url): url for url in urls}
-            
-            for i, future in enumerate(as_completed(future_to_url)):
-                url = future_to_url[future]
-                try:
-                    assessment = future.result()
-                    if assessment:
-                        assessments.append(assessment)
-                        print(f"[{i+1}/{len(urls)}] ✓ {assessment['name']}")
-                    else:
-                        print(f"[{i+1}/{len(urls)}] ✗ Failed")
-                except Exception as e:
-                    print(f"[{i+1}/{len(urls)}] ✗ Error: {str(e)[:50]}")
+        assessments = asyncio.run(self.scrape_all_async(urls, max_concurrency, jsonl_path))
         
         print(f"\n✓ Successfully scraped {len(assessments)} assessments")
+        if len(assessments) < len(urls):
+            print(f"✗ Failed: {len(urls) - len(assessments)}")
         return assessments
     
     def expand_url_list(self, initial_urls):
@@ -181,11 +239,11 @@ class FullSHLScraper:
             for page_num in range(1, 20):
                 page_url = f"{self.base_url}?page={page_num}"
                 response = self.session.get(page_url, timeout=10)
-                soup = BeautifulSoup(response.text, 'lxml')
-                links = soup.find_all('a', href=True)
-                for link in links:
-                    if '/product-catalog/view/' in link['href']:
-                        full_url = urljoin(self.base_url, link['href'])
+                tree = LexborHTMLParser(response.text)
+                for link in tree.css('a[href]'):
+                    href = link.attributes['href']
+                    if '/product-catalog/view/' in href:
+                        full_url = urljoin(self.base_url, href)
                         expanded.add(full_url.split('#')[0].split('?')[0])
         except:
             pass
@@ -194,8 +252,8 @@ class FullSHLScraper:
     
     def save_to_json(self, assessments, filename='shl_full_catalog.json'):
         """Save to JSON"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(assessments, f, indent=2, ensure_ascii=False)
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(assessments, option=orjson.OPT_INDENT_2))
         print(f"\n✓ Saved to {filename}")
 
 
@@ -209,7 +267,7 @@ def main():
     print("\nTarget: 377+ Individual Test Solutions")
     print("This may take 10-15 minutes...\n")
     
-    assessments = scraper.scrape_all_parallel(max_workers=10)
+    assessments = scraper.scrape_all(max_concurrency=20)
     
     print("\n" + "="*80)
     print(f"SCRAPING COMPLETE: {len(assessments)} assessments")
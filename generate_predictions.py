@@ -3,6 +3,7 @@ Generate predictions on the test set
 """
 import pandas as pd
 from recommendation_engine import RecommendationEngine
+from load_data import load_sheet
 import sys
 
 def generate_predictions(excel_path, output_csv='test_predictions.csv'):
@@ -14,19 +15,15 @@ def generate_predictions(excel_path, output_csv='test_predictions.csv'):
     
     # Load test data
     print(f"\nLoading test data from: {excel_path}")
-    df_test = pd.read_excel(excel_path, sheet_name='Test-Set')
+    df_test = load_sheet(excel_path, 'Test-Set', usecols=['Query'])
     print(f"Found {len(df_test)} test queries")
     
-    # Generate predictions
-    predictions = []
+    # Generate predictions (top 10 per query) in one batch
+    queries = df_test['Query'].tolist()
+    batch_recommendations = engine.recommend_batch(queries, top_k=10)
     
-    for idx, row in df_test.iterrows():
-        query = row['Query']
-        print(f"\n[{idx+1}/{len(df_test)}] Processing query...")
-        print(f"Query: {query[:80]}...")
-        
-        # Get top 10 recommendations
-        recommendations = engine.recommend(query, top_k=10)
+    predictions = []
+    for query, recommendations in zip(queries, batch_recommendations):
         formatted = engine.format_recommendations(recommendations)
         
         # Add each recommendation to predictions
@@ -35,8 +32,6 @@ def generate_predictions(excel_path, output_csv='test_predictions.csv'):
                 'Query': query,
                 'Assessment_url': rec['url']
             })
-        
-        print(f"  → Generated {len(formatted)} recommendations")
     
     # Create DataFrame
     df_predictions = pd.DataFrame(predictions)
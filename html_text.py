@@ -0,0 +1,75 @@
+"""
+Streaming text extraction for the scrapers
+Shared by scraper.py and scraper_v2.py; text joins mirror BeautifulSoup's get_text()
+"""
+import re
+from io import BytesIO
+from lxml import etree
+
+# Elements whose text get_text() never included
+EXCLUDED_TAGS = frozenset(('script', 'style', 'template'))
+
+# A charset declaration in the page head, which libxml2 honours when no encoding is given
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset', re.IGNORECASE)
+
+def stream_page(html, select, encoding=None):
+    """
+    Parse an HTML page in one lxml iterparse pass, freeing each element once its text is collected.
+    Raw response bytes are decoded by libxml2 itself: as `encoding` (the HTTP charset) if given,
+    else as the page's <meta charset>, else as UTF-8.
+    Returns (text_nodes, matches): the page's text nodes in document order, and a
+    (tag, attrib, text_nodes) tuple per element for which select(element) is true, in document order.
+    """
+    matches = []
+    open_elements = []  # (match, text nodes of each finished child) per element not yet closed
+    excluded_depth = 0
+    text_nodes = None
+    
+    if isinstance(html, str):
+        html, encoding = html.encode('utf-8'), 'utf-8'
+    elif encoding is None and not META_CHARSET_RE.search(html, 0, 1024):
+        encoding = 'utf-8'  # libxml2 would otherwise assume Latin-1
+    
+    events = etree.iterparse(BytesIO(html), events=('start', 'end'), html=True, encoding=encoding)
+    for event, element in events:
+        if event == 'start':
+            # Attributes are complete at start; text is only complete at end
+            match = [element.tag, dict(element.attrib), None] if select(element) else None
+            if match:
+                matches.append(match)
+            open_elements.append((match, []))
+            if element.tag in EXCLUDED_TAGS:
+                excluded_depth += 1
+            continue
+        
+        match, child_text_nodes = open_elements.pop()
+        if element.tag in EXCLUDED_TAGS:
+            excluded_depth -= 1
+            text_nodes = []
+        else:
+            # Children's tails are known now, so stitch text back in document order
+            text_nodes = [element.text] if element.text else []
+            child_texts = iter(child_text_nodes)
+            for child in element:
+                if isinstance(child.tag, str):  # comments and PIs have no text of their own
+                    text_nodes.extend(next(child_texts))
+                if child.tail:
+                    text_nodes.append(child.tail)
+        if match:
+            match[2] = [] if excluded_depth else text_nodes
+        
+        # The parent still needs this element's tail, so keep it
+        element.clear(keep_tail=True)
+        if open_elements:
+            open_elements[-1][1].append(text_nodes)
+    
+    if text_nodes is None:
+        raise etree.ParserError('Document is empty')
+    return text_nodes, [tuple(match) for match in matches]
+
+def join_text(text_nodes, separator='', strip=False):
+    """Join text nodes like BeautifulSoup's get_text(separator, strip)"""
+    if strip:
+        text_nodes = [t.strip() for t in text_nodes]
+        text_nodes = [t for t in text_nodes if t]
+    return separator.join(text_nodes)
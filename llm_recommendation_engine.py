@@ -3,12 +3,19 @@ LLM-Based Assessment Recommendation Engine
 Uses Google Gemini API + Sentence Transformers for hybrid retrieval
 CRITICAL: This addresses the LLM integration requirement
 """
+import atexit
+import hashlib
 import json
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+import orjson
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from google import genai
 import os
 import re
+import threading
+from categorize import build_category_automaton, categorize
+from vector_operations import sparse_similarities, top_k_indices
 
 # Try to load .env file if python-dotenv is available
 try:
@@ -27,6 +34,137 @@ except (ImportError, AttributeError) as e:
     USE_EMBEDDINGS = False
     print(f"⚠ Sentence-transformers not available ({str(e)[:50]}), using TF-IDF fallback")
 
+# FAISS serves embedding retrieval when installed; otherwise a dense matrix product is used
+try:
+    import faiss
+    USE_FAISS = True
+except ImportError:
+    USE_FAISS = False
+
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_CACHE_DIR = '.cache'
+QUANTIZE_EMBEDDINGS = True  # Keep the in-memory catalog as int8 + per-row scales (4x less than float32)
+EMBEDDING_DOT_ROWS = 4096  # int8 catalog rows upcast to float32 at a time when scoring a query
+HNSW_MIN_VECTORS = 10000  # Catalogs at least this large get an approximate HNSW index instead of exact search
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 128  # Explored neighbours per query; keeps recall of the 30 candidates high
+
+# Fallback requirement extraction: (field, value) tags matched in one pass over the query
+REQUIREMENT_KEYWORDS = {
+    ('skills', 'Java'): ['java'],
+    ('skills', 'Python'): ['python'],
+    ('skills', 'JavaScript'): ['javascript'],
+    ('skills', 'SQL'): ['sql'],
+    ('skills', 'HTML'): ['html'],
+    ('skills', 'CSS'): ['css'],
+    ('soft_skills', 'Communication'): ['communication', 'collaborate', 'interpersonal'],
+    ('soft_skills', 'Leadership'): ['leadership', 'manager', 'lead'],
+    ('mentions', 'personality'): ['personality'],
+    ('mentions', 'cognitive'): ['cognitive', 'reasoning', 'analytical']
+}
+REQUIREMENT_AUTOMATON = build_category_automaton(REQUIREMENT_KEYWORDS)
+
+def load_embedding_model():
+    """Load the sentence-transformers model on GPU (fp16) when available, else CPU"""
+    import torch
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=device)
+    if device == 'cuda':
+        model = model.half()
+    return model
+
+def embedding_text(assessment):
+    """Combine the assessment fields that are embedded for semantic search"""
+    text = f"{assessment.get('name', '')} {assessment.get('description', '')} "
+    text += f"{' '.join(assessment.get('categories', []))} {assessment.get('test_type', '')}"
+    return text
+
+def catalog_text_sha1(assessments):
+    """SHA-1 of the embedded text of every assessment, in catalog order"""
+    texts = [embedding_text(assessment) for assessment in assessments]
+    return hashlib.sha1('\n'.join(texts).encode('utf-8')).hexdigest()
+
+def load_embedding_matrix(path, scales_path):
+    """
+    Memory-map an embedding matrix, with its row scales if it is int8-quantized.
+    Returns (embeddings, scales), or None for an int8 matrix whose scales file is missing.
+    """
+    # mmap_mode='r' lets every worker process share the same pages
+    embeddings = np.load(path, mmap_mode='r')
+    if embeddings.dtype != np.int8:
+        return embeddings, None
+    if not os.path.exists(scales_path):
+        print(f"⚠ {path} is int8-quantized but {scales_path} is missing")
+        return None
+    return embeddings, np.load(scales_path)
+
+def load_precomputed_embeddings(embeddings_path, assessments):
+    """
+    Memory-map a catalog embedding matrix built by build_catalog_embeddings.py.
+    Returns (embeddings, scales), where scales is None unless the matrix is int8-quantized,
+    or None if the files are missing or were built from a different catalog text or model.
+    """
+    base_path = os.path.splitext(embeddings_path)[0]
+    urls_path = base_path + '_urls.json'
+    meta_path = base_path + '_meta.json'
+    scales_path = base_path + '_scales.npy'
+    if not all(os.path.exists(path) for path in (embeddings_path, urls_path, meta_path)):
+        return None
+    
+    with open(urls_path, 'rb') as f:
+        urls = orjson.loads(f.read())
+    with open(meta_path, 'rb') as f:
+        meta = orjson.loads(f.read())
+    if urls != [assessment.get('url') for assessment in assessments]:
+        print(f"⚠ {embeddings_path} does not match the loaded catalog, re-encoding")
+        return None
+    if meta.get('model') != EMBEDDING_MODEL_NAME or meta.get('catalog_sha1') != catalog_text_sha1(assessments):
+        print(f"⚠ {embeddings_path} is stale (catalog text or model changed), re-encoding")
+        return None
+    
+    return load_embedding_matrix(embeddings_path, scales_path)
+
+def save_array_atomic(path, array):
+    """np.save via a temp file + rename, so concurrent workers never read a partial file"""
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+def quantize_embeddings(embeddings):
+    """Symmetric per-row int8 quantization; returns (int8 matrix, float32 row scales)"""
+    scales = np.max(np.abs(embeddings), axis=1) / 127
+    scales[scales == 0] = 1
+    quantized = np.round(embeddings / scales[:, np.newaxis]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+def build_faiss_index(embeddings, scales=None):
+    """
+    Inner-product HNSW graph index over the (dequantized) catalog embeddings, cached under .cache/.
+    Only worth its float32 copy of the catalog for large catalogs (see HNSW_MIN_VECTORS).
+    """
+    vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if scales is not None:
+        vectors = vectors * scales[:, np.newaxis]
+    
+    digest = hashlib.sha1(vectors.tobytes()).hexdigest()[:12]
+    cache_path = os.path.join(EMBEDDING_CACHE_DIR, f'hnsw_{digest}.faiss')
+    if os.path.exists(cache_path):
+        index = faiss.read_index(cache_path)
+        print(f"✓ Loaded cached HNSW index from {cache_path}")
+    else:
+        index = faiss.IndexHNSWFlat(vectors.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.add(vectors)
+        try:
+            os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            faiss.write_index(index, tmp_path)
+            os.replace(tmp_path, cache_path)
+        except (OSError, RuntimeError) as e:
+            print(f"⚠ Could not cache HNSW index: {str(e)[:50]}")
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
 class LLMRecommendationEngine:
     """
     Hybrid Recommendation Engine:
@@ -35,9 +173,26 @@ class LLMRecommendationEngine:
     3. Balances recommendations based on test types
     """
     
-    def __init__(self, assessments_path='shl_full_catalog.json', api_key=None):
+    QUERY_CACHE_MAX = 1024  # Query embeddings kept in memory (LRU)
+    
+    def __init__(self, assessments_path='shl_full_catalog.json', api_key=None, embeddings_path=None,
+                 query_cache_path=None):
         """Initialize with LLM and embedding models"""
         self.assessments = self.load_assessments(assessments_path)
+        self.build_text_fields()
+        self.embeddings_path = embeddings_path
+        
+        # Query embedding cache keyed by normalized query text, optionally persisted across restarts
+        self._query_cache = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        self.query_cache_path = query_cache_path
+        
+        # Per-thread similarity buffers reused across queries (see similarity_buffer)
+        self._thread_buffers = threading.local()
+        
+        # Overlaps the two separate Gemini calls of the fallback path; the sync client's
+        # connection pool is shared by every thread, so no call pays a fresh handshake
+        self._llm_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='gemini')
         
         # Configure Gemini API (New SDK)
         if not api_key:
@@ -60,9 +215,18 @@ class LLMRecommendationEngine:
         # Initialize embedding model or TF-IDF
         if USE_EMBEDDINGS:
             print("Loading sentence-transformers model...")
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.embedding_model = load_embedding_model()
             self.assessment_embeddings = None
+            self.embedding_scales = None
             self.build_embedding_index()
+            self.faiss_index = None
+            # Smaller catalogs keep exact search straight off the shared int8 (mmapped) matrix
+            if USE_FAISS and len(self.assessment_embeddings) >= HNSW_MIN_VECTORS:
+                self.faiss_index = build_faiss_index(self.assessment_embeddings, self.embedding_scales)
+                print(f"✓ Built FAISS index ({type(self.faiss_index).__name__})")
+            if query_cache_path:
+                self.load_query_cache()
+                atexit.register(self.save_query_cache)
         else:
             print("Using TF-IDF vectorizer...")
             self.vectorizer = None
@@ -72,45 +236,98 @@ class LLMRecommendationEngine:
     def load_assessments(self, path):
         """Load assessment catalog"""
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                assessments = json.load(f)
+            with open(path, 'rb') as f:
+                assessments = orjson.loads(f.read())
             print(f"✓ Loaded {len(assessments)} assessments from {path}")
             return assessments
         except FileNotFoundError:
             # Fallback to smaller dataset if full catalog not available yet
             try:
-                with open('assessments_data.json', 'r', encoding='utf-8') as f:
-                    assessments = json.load(f)
+                with open('assessments_data.json', 'rb') as f:
+                    assessments = orjson.loads(f.read())
                 print(f"⚠ Using fallback dataset: {len(assessments)} assessments")
                 return assessments
             except:
                 print("ERROR: No assessment data found!")
                 return []
     
+    def build_text_fields(self):
+        """Extract the indexed and returned fields once, as parallel lists aligned with self.assessments"""
+        self.names = [a.get('name', '') for a in self.assessments]
+        self.descriptions = [a.get('description', '') for a in self.assessments]
+        self.categories_joined = [' '.join(a.get('categories', [])) for a in self.assessments]
+        self.test_types = [a.get('test_type', '') for a in self.assessments]
+        self.test_types_arr = np.array(self.test_types, dtype=str)
+        
+        # Response columns used by format_for_api
+        self.urls = [a.get('url', '') for a in self.assessments]
+        self.short_descriptions = [d[:200] for d in self.descriptions]
+        self.durations = [a.get('duration', 0) for a in self.assessments]
+        self.adaptive_support = [a.get('adaptive_support', 'No') for a in self.assessments]
+        self.remote_support = [a.get('remote_support', 'No') for a in self.assessments]
+    
     def build_embedding_index(self):
         """Build embedding index for semantic search"""
+        if self.embeddings_path:
+            precomputed = load_precomputed_embeddings(self.embeddings_path, self.assessments)
+            if precomputed is not None:
+                self.assessment_embeddings, self.embedding_scales = precomputed
+                print(f"✓ Loaded precomputed embedding index from {self.embeddings_path}")
+                return
+        
+        # Same text as embedding_text(), built from the precomputed fields
+        texts = [f"{n} {d} {c} {t}" for n, d, c, t in
+                 zip(self.names, self.descriptions, self.categories_joined, self.test_types)]
+        
+        # Cache keyed by model + catalog text, so any catalog edit forces a re-encode
+        digest = hashlib.sha1('\n'.join([EMBEDDING_MODEL_NAME] + texts).encode('utf-8')).hexdigest()[:12]
+        cache_path = os.path.join(EMBEDDING_CACHE_DIR, f'emb_{digest}.npy')
+        scales_path = os.path.join(EMBEDDING_CACHE_DIR, f'emb_{digest}_scales.npy')
+        cached = load_embedding_matrix(cache_path, scales_path) if os.path.exists(cache_path) else None
+        if cached is not None:
+            self.assessment_embeddings, self.embedding_scales = cached
+            print(f"✓ Loaded cached embedding index from {cache_path}")
+            return
+        
         print("Building embedding index...")
-        texts = []
-        for assessment in self.assessments:
-            # Combine relevant fields for embedding
-            text = f"{assessment.get('name', '')} {assessment.get('description', '')} "
-            text += f"{' '.join(assessment.get('categories', []))} {assessment.get('test_type', '')}"
-            texts.append(text)
-        
-        self.assessment_embeddings = self.embedding_model.encode(texts, show_progress_bar=True)
+        # Rows are L2-normalized once so cosine similarity is a plain dot product per query
+        embeddings = self.embedding_model.encode(
+            texts,
+            batch_size=128,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if QUANTIZE_EMBEDDINGS:
+            self.assessment_embeddings, self.embedding_scales = quantize_embeddings(embeddings)
+        else:
+            self.assessment_embeddings = embeddings
         print(f"✓ Built embedding index with {len(self.assessment_embeddings)} vectors")
+        
+        try:
+            os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+            # Matrix last, so its presence implies the scales are complete
+            if QUANTIZE_EMBEDDINGS:
+                save_array_atomic(scales_path, self.embedding_scales)
+            save_array_atomic(cache_path, self.assessment_embeddings)
+        except OSError as e:
+            print(f"⚠ Could not cache embedding index: {str(e)[:50]}")
+            return
+        
+        # Swap the private copy for a read-only mapping of the cache file, so the worker that
+        # encoded shares the same physical pages as the workers that load the cache
+        self.assessment_embeddings = np.load(cache_path, mmap_mode='r')
     
     def build_tfidf_index(self):
         """Fallback: Build TF-IDF index"""
         from sklearn.feature_extraction.text import TfidfVectorizer
         
-        texts = []
-        for assessment in self.assessments:
-            text = f"{assessment.get('name', '')} {assessment.get('description', '')} "
-            text += f"{' '.join(assessment.get('categories', []))}"
-            texts.append(text)
+        texts = [f"{n} {d} {c}" for n, d, c in zip(self.names, self.descriptions, self.categories_joined)]
         
-        self.vectorizer = TfidfVectorizer(max_features=500, ngram_range=(1, 2), stop_words='english')
+        # norm='l2' keeps every row unit-length, so cosine similarity is a dot product
+        self.vectorizer = TfidfVectorizer(max_features=500, ngram_range=(1, 2), stop_words='english', norm='l2',
+                                          dtype=np.float32)
         self.assessment_vectors = self.vectorizer.fit_transform(texts)
         print(f"✓ Built TF-IDF index")
     
@@ -163,51 +380,186 @@ Return ONLY valid JSON, no other text."""
             'key_focus': 'general assessment'
         }
         
-        # Extract skills
-        skill_map = {
-            'java': 'Java', 'python': 'Python', 'javascript': 'JavaScript',
-            'sql': 'SQL', 'html': 'HTML', 'css': 'CSS'
-        }
-        for keyword, skill in skill_map.items():
-            if keyword in query_lower:
-                requirements['skills'].append(skill)
-        
-        # Soft skills
-        if any(word in query_lower for word in ['communication', 'collaborate', 'interpersonal']):
-            requirements['soft_skills'].append('Communication')
-        if any(word in query_lower for word in ['leadership', 'manager', 'lead']):
-            requirements['soft_skills'].append('Leadership')
+        # Extract skills, soft skills and test type hints in one scan
+        mentions = set()
+        for field, value in categorize(query_lower, REQUIREMENT_AUTOMATON):
+            if field == 'mentions':
+                mentions.add(value)
+            else:
+                requirements[field].append(value)
         
         # Determine test types
         if requirements['skills']:
             requirements['test_types_needed'].append('Knowledge & Skills')
-        if requirements['soft_skills'] or 'personality' in query_lower:
+        if requirements['soft_skills'] or 'personality' in mentions:
             requirements['test_types_needed'].append('Personality & Behavior')
-        if any(word in query_lower for word in ['cognitive', 'reasoning', 'analytical']):
+        if 'cognitive' in mentions:
             requirements['test_types_needed'].append('Cognitive')
         
         return requirements
     
+    def load_query_cache(self):
+        """Warm the query embedding cache from disk"""
+        if not os.path.exists(self.query_cache_path):
+            return
+        try:
+            with np.load(self.query_cache_path) as data:
+                for key, embedding in zip(data['keys'], data['embeddings']):
+                    self._query_cache[str(key)] = embedding
+            print(f"✓ Loaded {len(self._query_cache)} cached query embeddings")
+        except Exception as e:
+            print(f"⚠ Could not load query cache: {str(e)[:50]}")
+    
+    def save_query_cache(self):
+        """Persist the query embedding cache (atomic replace, safe with several workers)"""
+        with self._query_cache_lock:
+            if not self._query_cache:
+                return
+            keys = np.array(list(self._query_cache.keys()))
+            embeddings = np.stack(list(self._query_cache.values()))
+        tmp_path = f"{self.query_cache_path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, keys=keys, embeddings=embeddings)
+        os.replace(tmp_path, self.query_cache_path)
+    
+    def _encode_query(self, query):
+        """L2-normalized query embedding, served from the LRU cache when possible"""
+        key = query.strip().lower()
+        with self._query_cache_lock:
+            if key in self._query_cache:
+                self._query_cache.move_to_end(key)
+                return self._query_cache[key]
+        
+        embedding = self.embedding_model.encode([query.strip()], normalize_embeddings=True)[0].astype(np.float32)
+        with self._query_cache_lock:
+            self._query_cache[key] = embedding
+            while len(self._query_cache) > self.QUERY_CACHE_MAX:
+                self._query_cache.popitem(last=False)
+        return embedding
+    
+    def embed_query(self, query):
+        """Embed a query as an L2-normalized 1-D vector (used by the API cache)"""
+        if USE_EMBEDDINGS:
+            return self._encode_query(query)
+        # The vectorizer already L2-normalizes each row (all-zero when no term matches)
+        return self.vectorizer.transform([query]).toarray()[0]
+    
+    def embedding_similarities(self, query_embedding):
+        """
+        Cosine similarities for an L2-normalized query against the normalized catalog.
+        int8-quantized catalogs are upcast EMBEDDING_DOT_ROWS rows at a time (a float32 dot
+        would otherwise copy the whole matrix per query) and rescaled by their per-row scales.
+        """
+        similarities = self.similarity_buffer()
+        if self.embedding_scales is None:
+            return np.dot(self.assessment_embeddings, query_embedding, out=similarities)
+        
+        for start in range(0, len(similarities), EMBEDDING_DOT_ROWS):
+            rows = self.assessment_embeddings[start:start + EMBEDDING_DOT_ROWS].astype(np.float32)
+            np.dot(rows, query_embedding, out=similarities[start:start + EMBEDDING_DOT_ROWS])
+        similarities *= self.embedding_scales
+        return similarities
+    
+    def similarity_buffer(self):
+        """
+        Reusable float32 buffer with one slot per assessment, private to the calling thread.
+        Its contents are only valid until the same thread scores the next query.
+        """
+        buffer = getattr(self._thread_buffers, 'similarities', None)
+        if buffer is None:
+            buffer = np.empty(len(self.assessments), dtype=np.float32)
+            self._thread_buffers.similarities = buffer
+        return buffer
+    
     def retrieve_candidates(self, query, top_k=30):
-        """Retrieve candidate assessments using embeddings/TF-IDF"""
+        """
+        Retrieve candidate assessments using embeddings/TF-IDF.
+        Returns (catalog indices, similarity scores), best first.
+        """
+        if USE_EMBEDDINGS and self.faiss_index is not None:
+            query_embedding = np.asarray(self._encode_query(query), dtype=np.float32)[np.newaxis, :]
+            scores, indices = self.faiss_index.search(query_embedding, top_k)
+            found = indices[0] >= 0  # FAISS pads with -1 when top_k exceeds the catalog
+            return indices[0][found].astype(np.intp), scores[0][found]
+        
         if USE_EMBEDDINGS:
-            query_embedding = self.embedding_model.encode([query])
-            similarities = cosine_similarity(query_embedding, self.assessment_embeddings)[0]
+            similarities = self.embedding_similarities(self._encode_query(query))
         else:
             query_vector = self.vectorizer.transform([query])
-            similarities = cosine_similarity(query_vector, self.assessment_vectors)[0]
+            similarities = self.similarity_buffer()
+            sparse_similarities(query_vector, self.assessment_vectors, out=similarities[np.newaxis, :])
         
-        # Get top candidates
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        # Get top candidates (fancy indexing copies the scores out of the shared buffer)
+        top_indices = top_k_indices(similarities, top_k)
+        return top_indices, similarities[top_indices]
+    
+    def candidate_summary(self, candidates):
+        """Numbered candidate list shown to the LLM"""
+        candidate_list = []
+        for i, idx in enumerate(candidates[:20]):  # Limit for LLM context
+            ass = self.assessments[idx]
+            candidate_list.append(f"{i+1}. {ass['name']} - {', '.join(ass.get('categories', []))}")
+        return chr(10).join(candidate_list)
+    
+    def apply_ranking(self, candidates, indices, top_k):
+        """Reorder candidate indices by 0-based LLM positions, filling up with the similarity order"""
+        positions = [idx for idx in indices[:top_k] if 0 <= idx < len(candidates)]
+        
+        # Fill remaining with original order if needed
+        picked = set(positions)
+        positions += [pos for pos in range(len(candidates)) if pos not in picked]
+        return candidates[np.asarray(positions[:top_k], dtype=np.intp)]
+    
+    def analyze_and_rerank(self, query, candidates, top_k=10):
+        """
+        Extract requirements and re-rank candidates with a single LLM call.
+        Returns (requirements, reranked), or None if the response could not be parsed.
+        """
+        try:
+            prompt = f"""Given this job requirement or query:
+"{query}"
+
+And these assessment options:
+{self.candidate_summary(candidates)}
+
+Return a JSON object with two keys:
+1. requirements: an object with
+   - skills: List of technical skills mentioned (e.g., Java, Python, SQL)
+   - soft_skills: List of soft skills (e.g., communication, leadership)
+   - experience_level: entry/mid/senior level
+   - test_types_needed: List from [Knowledge & Skills, Personality & Behavior, Cognitive, Communication]
+   - key_focus: Brief summary of what to prioritize
+2. ranking: the index numbers of the top {top_k} most relevant assessments, best first (e.g., [3, 1, 5])
+   Consider technical skills match, soft skills match, test type appropriateness,
+   and balance between knowledge and behavioral tests if both needed
+
+Return ONLY valid JSON, no other text."""
+            
+            response = self.client.models.generate_content(
+                model=self.model_name,
+                contents=prompt
+            )
+            result_text = response.text.strip()
+        except Exception as e:
+            print(f"⚠ LLM analysis failed: {str(e)[:50]}, using fallback")
+            return self.extract_requirements_fallback(query), candidates[:top_k]
         
-        candidates = []
-        for idx in top_indices:
-            candidates.append({
-                'assessment': self.assessments[idx],
-                'similarity_score': float(similarities[idx])
-            })
+        try:
+            json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
+            if not json_match:
+                raise ValueError('no JSON object in response')
+            result = json.loads(json_match.group())
+            requirements = result['requirements']
+            indices = [int(x) - 1 for x in result['ranking']]
+            if not isinstance(requirements, dict):
+                raise ValueError('requirements is not an object')
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"⚠ Could not parse combined LLM response: {str(e)[:50]}")
+            return None
         
-        return candidates
+        reranked = self.apply_ranking(candidates, indices, top_k)
+        print(f"✓ LLM extracted: {requirements.get('key_focus', '')}")
+        print(f"✓ LLM re-ranked {len(reranked)} assessments")
+        return requirements, reranked
     
     def rerank_with_llm(self, query, candidates, top_k=10):
         """Use LLM to re-rank candidates for better relevance"""
@@ -215,17 +567,11 @@ Return ONLY valid JSON, no other text."""
             return candidates[:top_k]
         
         try:
-            # Prepare candidate summary
-            candidate_list = []
-            for i, cand in enumerate(candidates[:20]):  # Limit for LLM context
-                ass = cand['assessment']
-                candidate_list.append(f"{i+1}. {ass['name']} - {', '.join(ass.get('categories', []))}")
-            
             prompt = f"""Given this job requirement:
 "{query}"
 
 And these assessment options:
-{chr(10).join(candidate_list)}
+{self.candidate_summary(candidates)}
 
 Rank the top {top_k} most relevant assessments by their index numbers.
 Consider:
@@ -246,18 +592,10 @@ Return ONLY a comma-separated list of index numbers (e.g., "3,1,5,7,2,4,8,9,6,10
             indices = [int(x.strip())-1 for x in re.findall(r'\d+', ranking_text)]
             
             # Reorder candidates based on LLM ranking
-            reranked = []
-            for idx in indices[:top_k]:
-                if 0 <= idx < len(candidates):
-                    reranked.append(candidates[idx])
-            
-            # Fill remaining with original order if needed
-            for cand in candidates:
-                if cand not in reranked and len(reranked) < top_k:
-                    reranked.append(cand)
+            reranked = self.apply_ranking(candidates, indices, top_k)
             
             print(f"✓ LLM re-ranked {len(reranked)} assessments")
-            return reranked[:top_k]
+            return reranked
             
         except Exception as e:
             print(f"⚠ LLM re-ranking failed: {str(e)[:50]}, using similarity order")
@@ -269,68 +607,94 @@ Return ONLY a comma-separated list of index numbers (e.g., "3,1,5,7,2,4,8,9,6,10
         print(f"Query: {query[:100]}...")
         print('='*60)
         
-        # Step 1: Extract requirements using LLM
-        requirements = self.extract_requirements_with_llm(query)
-        
-        # Step 2: Retrieve candidates using embeddings
-        candidates = self.retrieve_candidates(query, top_k=30)
+        # Step 1: Retrieve candidates using embeddings (catalog indices, best first)
+        candidates, candidate_scores = self.retrieve_candidates(query, top_k=30)
         print(f"→ Retrieved {len(candidates)} candidates")
         
-        # Step 3: Re-rank using LLM
-        reranked = self.rerank_with_llm(query, candidates, top_k=top_k)
+        # Step 2: Extract requirements and re-rank in one LLM call
+        analysis = None
+        if self.use_llm and len(candidates):
+            analysis = self.analyze_and_rerank(query, candidates, top_k=top_k)
+        
+        if analysis is not None:
+            requirements, reranked = analysis
+        elif self.use_llm:
+            # Separate extraction and re-ranking calls, overlapped
+            requirements_future = self._llm_pool.submit(self.extract_requirements_with_llm, query)
+            reranked = self.rerank_with_llm(query, candidates, top_k=top_k)
+            requirements = requirements_future.result()
+        else:
+            requirements = self.extract_requirements_fallback(query)
+            reranked = candidates[:top_k]
+        
+        # Step 3: Balance test types if needed
+        final_indices = self.balance_by_test_type(reranked, requirements, top_k)
         
-        # Step 4: Balance test types if needed
-        final_recommendations = self.balance_by_test_type(reranked, requirements, top_k)
+        # Materialize the assessment records only for the final picks
+        score_by_index = dict(zip(candidates.tolist(), candidate_scores.tolist()))
+        final_recommendations = [{
+            'index': idx,
+            'assessment': self.assessments[idx],
+            'similarity_score': score_by_index[idx]
+        } for idx in final_indices.tolist()]
         
         print(f"✓ Final: {len(final_recommendations)} recommendations")
         return final_recommendations
     
     def balance_by_test_type(self, candidates, requirements, top_k):
-        """Ensure balanced mix of test types"""
+        """Ensure balanced mix of test types among candidate catalog indices"""
         test_types_needed = requirements.get('test_types_needed', [])
         
         if len(test_types_needed) < 2:
             return candidates[:top_k]
         
-        # Separate by test type
-        by_type = {'K': [], 'P': [], 'Other': []}
-        for cand in candidates:
-            test_type = cand['assessment'].get('test_type', '')
-            if test_type == 'K':
-                by_type['K'].append(cand)
-            elif test_type == 'P':
-                by_type['P'].append(cand)
-            else:
-                by_type['Other'].append(cand)
-        
         # Mix appropriately
-        balanced = []
         if 'Knowledge & Skills' in test_types_needed and 'Personality & Behavior' in test_types_needed:
-            # 60-40 split
-            balanced.extend(by_type['K'][:int(top_k * 0.6)])
-            balanced.extend(by_type['P'][:int(top_k * 0.4)])
+            # 60-40 split, partitioned by test type with array masks
+            types = self.test_types_arr[candidates]
+            balanced = np.concatenate((candidates[types == 'K'][:int(top_k * 0.6)],
+                                       candidates[types == 'P'][:int(top_k * 0.4)]))
         else:
             balanced = candidates[:top_k]
         
-        # Fill remaining
-        for cand in candidates:
-            if cand not in balanced and len(balanced) < top_k:
-                balanced.append(cand)
+        # Fill remaining, in candidate order and without repeats
+        fill = []
+        seen = set(balanced.tolist())
+        for idx in candidates.tolist():
+            if len(balanced) + len(fill) >= top_k:
+                break
+            if idx not in seen:
+                fill.append(idx)
+                seen.add(idx)
         
-        return balanced[:top_k]
+        return np.concatenate((balanced, np.asarray(fill, dtype=candidates.dtype)))[:top_k]
     
-    def format_for_api(self, recommendations):
-        """Format recommendations for API response"""
+    def format_for_api(self, recommendations, shape='internal'):
+        """
+        Format recommendations for API response, built from the precomputed catalog columns.
+        shape='api' yields the exact /recommend response items; 'internal' the legacy keys.
+        """
+        indices = [rec['index'] for rec in recommendations]
+        if shape == 'api':
+            return [{
+                'url': self.urls[i],
+                'name': self.names[i],
+                'adaptive_support': self.adaptive_support[i],
+                'description': self.short_descriptions[i],
+                'duration': self.durations[i],
+                'remote_support': self.remote_support[i],
+                'test_type': [self.test_types[i]] if self.test_types[i] else []
+            } for i in indices]
+        
         return [{
-            'assessment_name': rec['assessment']['name'],
-            'assessment_url': rec['assessment']['url'],
-            'description': rec['assessment'].get('description', '')[:200],
-            'duration': rec['assessment'].get('duration', 0),
-            'test_type': rec['assessment'].get('test_type', ''),
-            'adaptive_support': rec['assessment'].get('adaptive_support', 'No'),
-            'remote_support': rec['assessment'].get('remote_support', 'No')
-        } for rec in recommendations]
-
+            'assessment_name': self.names[i],
+            'assessment_url': self.urls[i],
+            'description': self.short_descriptions[i],
+            'duration': self.durations[i],
+            'test_type': self.test_types[i],
+            'adaptive_support': self.adaptive_support[i],
+            'remote_support': self.remote_support[i]
+        } for i in indices]
 
 def main():
     """Test the LLM recommendation engine"""
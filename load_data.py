@@ -3,19 +3,45 @@ Load and process the training data from Excel file
 """
 import pandas as pd
 import json
+import os
+
+# calamine (Rust) parses workbooks several times faster than openpyxl
+try:
+    import python_calamine
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
+def load_sheet(excel_path, sheet_name, usecols=None):
+    """
+    Load an Excel sheet (optionally only `usecols`) as strings, caching it as parquet next to the workbook.
+    The cache is reused until the workbook is modified.
+    """
+    cols_suffix = f".{'-'.join(usecols)}" if usecols else ''
+    cache_path = f"{excel_path}.{sheet_name}{cols_suffix}.parquet"
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(excel_path):
+        return pd.read_parquet(cache_path)
+    
+    # dtype=str skips type inference
+    df = pd.read_excel(excel_path, sheet_name=sheet_name, engine=EXCEL_ENGINE, usecols=usecols, dtype=str)
+    try:
+        df.to_parquet(cache_path, index=False)
+    except Exception as e:
+        print(f"⚠ Could not cache {sheet_name} as parquet: {str(e)[:50]}")
+    return df
 
 def load_training_data(excel_path):
     """Load training data from Excel file"""
     try:
         # Read the Train-Set sheet
-        df_train = pd.read_excel(excel_path, sheet_name='Train-Set')
+        df_train = load_sheet(excel_path, 'Train-Set', usecols=['Query', 'Assessment_url'])
         print(f"Loaded {len(df_train)} training examples")
         print(f"Columns: {df_train.columns.tolist()}")
         print(f"\nFirst few rows:")
         print(df_train.head())
         
         # Extract unique assessment URLs
-        unique_urls = df_train['Assessment_url'].unique()
+        unique_urls = pd.unique(df_train['Assessment_url'].values)
         print(f"\nFound {len(unique_urls)} unique assessment URLs in training data")
         
         return df_train, unique_urls
@@ -28,7 +54,7 @@ def load_test_data(excel_path):
     """Load test data from Excel file"""
     try:
         # Read the Test-Set sheet
-        df_test = pd.read_excel(excel_path, sheet_name='Test-Set')
+        df_test = load_sheet(excel_path, 'Test-Set', usecols=['Query'])
         print(f"\nLoaded {len(df_test)} test queries")
         print(df_test.head())
         
@@ -38,19 +64,17 @@ def load_test_data(excel_path):
         print(f"Error loading test data: {e}")
         return None
 
+def extract_names_vectorized(urls):
+    """Extract assessment names from a Series of URLs in one vectorized pass"""
+    # URL format: https://www.shl.com/.../view/assessment-name/
+    slugs = urls.str.rstrip('/').str.extract(r'/view/([^/]*)', expand=False)
+    # Clean up the name and remove (new) or other parenthetical content
+    names = slugs.str.replace('-', ' ', regex=False).str.title().str.split('(').str[0].str.strip()
+    return names.fillna("Unknown Assessment")
+
 def extract_assessment_name_from_url(url):
     """Extract assessment name from URL"""
-    # URL format: https://www.shl.com/.../view/assessment-name/
-    if '/view/' in url:
-        parts = url.rstrip('/').split('/view/')
-        if len(parts) > 1:
-            name = parts[1].split('/')[0]
-            # Clean up the name
-            name = name.replace('-', ' ').title()
-            # Remove (new) or other parenthetical content
-            name = name.split('(')[0].strip()
-            return name
-    return "Unknown Assessment"
+    return extract_names_vectorized(pd.Series([url], dtype=object)).iloc[0]
 
 def main():
     """Test data loading"""
@@ -74,8 +98,8 @@ def main():
         
         # Extract names
         print("\n\nSample assessment names:")
-        for url in list(unique_urls)[:10]:
-            name = extract_assessment_name_from_url(url)
+        sample_urls = pd.Series(unique_urls[:10], dtype=object)
+        for name, url in zip(extract_names_vectorized(sample_urls), sample_urls):
             print(f"{name}: {url}")
     
     # Load test data
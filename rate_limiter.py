@@ -0,0 +1,22 @@
+"""
+Request rate limiting for the scrapers
+Shared by scraper.py and scraper_v2.py
+"""
+import asyncio
+import time
+
+class RateLimiter:
+    """Spaces request starts at least 1/rps seconds apart across all tasks on the event loop"""
+    
+    def __init__(self, rps):
+        self.min_interval = 1.0 / rps
+        self.next_slot = 0.0
+    
+    async def wait(self):
+        """Sleep until this caller's slot; concurrent callers are queued one interval apart"""
+        # Reserving the slot involves no await, so tasks on one loop cannot race here
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
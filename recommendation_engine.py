@@ -2,11 +2,50 @@
 Assessment Recommendation Engine
 Uses semantic similarity for matching queries to assessments
 """
-import json
+import orjson
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import re
+from categorize import build_category_automaton, categorize
+from vector_operations import sparse_similarities, top_k_indices
+
+SKILL_KEYWORDS = {
+    'java': ['java'],
+    'python': ['python'],
+    'javascript': ['javascript', 'js'],
+    'sql': ['sql', 'database'],
+    'excel': ['excel'],
+    'selenium': ['selenium'],
+    'html': ['html'],
+    'css': ['css'],
+    'leadership': ['leadership', 'manager', 'coo', 'executive'],
+    'communication': ['communication', 'interpersonal', 'english'],
+    'sales': ['sales', 'selling'],
+    'analytical': ['analytical', 'analyst', 'data'],
+    'personality': ['personality', 'behavioral', 'behavior'],
+    'cognitive': ['cognitive', 'reasoning', 'verbal', 'numerical'],
+}
+SKILL_AUTOMATON = build_category_automaton(SKILL_KEYWORDS)
+
+# Expansions never contain another abbreviation, so one pass matches the old sequential subs
+ABBREVIATION_EXPANSIONS = {
+    'jd': 'job description',
+    'qa': 'quality assurance',
+    'coo': 'chief operating officer',
+    'seo': 'search engine optimization',
+    'sql': 'structured query language database',
+    'html': 'web development markup',
+    'css': 'web styling',
+    'js': 'javascript programming',
+}
+ABBREVIATION_RE = re.compile(r'\b(' + '|'.join(ABBREVIATION_EXPANSIONS) + r')\b')
+
+# (pattern, is_range) in priority order
+DURATION_PATTERNS = [
+    (re.compile(r'(\d+)\s*(?:minutes?|mins?)'), False),
+    (re.compile(r'(\d+)\s*(?:hours?|hrs?)'), False),
+    (re.compile(r'(\d+)\s*-\s*(\d+)\s*(?:minutes?|mins?)'), True),
+]
 
 class RecommendationEngine:
     def __init__(self, assessments_path='assessments_data.json'):
@@ -18,32 +57,15 @@ class RecommendationEngine:
     
     def load_assessments(self, path):
         """Load assessment data"""
-        with open(path, 'r', encoding='utf-8') as f:
-            assessments = json.load(f)
+        with open(path, 'rb') as f:
+            assessments = orjson.loads(f.read())
         print(f"Loaded {len(assessments)} assessments")
         return assessments
     
     def preprocess_text(self, text):
         """Preprocess text for better matching"""
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Expand common abbreviations
-        expansions = {
-            'jd': 'job description',
-            'qa': 'quality assurance',
-            'coo': 'chief operating officer',
-            'seo': 'search engine optimization',
-            'sql': 'structured query language database',
-            'html': 'web development markup',
-            'css': 'web styling',
-            'js': 'javascript programming',
-        }
-        
-        for abbr, expansion in expansions.items():
-            text = re.sub(r'\b' + abbr + r'\b', expansion, text)
-        
-        return text
+        # Lowercase and expand common abbreviations in a single pass
+        return ABBREVIATION_RE.sub(lambda m: ABBREVIATION_EXPANSIONS[m.group(1)], text.lower())
     
     def build_index(self):
         """Build TF-IDF index for assessments"""
@@ -55,11 +77,14 @@ class RecommendationEngine:
             text = self.preprocess_text(text)
             assessment_texts.append(text)
         
-        # Build TF-IDF vectorizer
+        # Build TF-IDF vectorizer (norm='l2' keeps rows unit-length, so cosine is a dot product;
+        # float32 halves the sparse matrix and the similarity buffers)
         self.vectorizer = TfidfVectorizer(
             max_features=500,
             ngram_range=(1, 2),
-            stop_words='english'
+            stop_words='english',
+            norm='l2',
+            dtype=np.float32
         )
         
         self.assessment_vectors = self.vectorizer.fit_transform(assessment_texts)
@@ -77,38 +102,13 @@ class RecommendationEngine:
         }
         
         # Extract skills
-        skill_keywords = {
-            'java': ['java'],
-            'python': ['python'],
-            'javascript': ['javascript', 'js'],
-            'sql': ['sql', 'database'],
-            'excel': ['excel'],
-            'selenium': ['selenium'],
-            'html': ['html'],
-            'css': ['css'],
-            'leadership': ['leadership', 'manager', 'coo', 'executive'],
-            'communication': ['communication', 'interpersonal', 'english'],
-            'sales': ['sales', 'selling'],
-            'analytical': ['analytical', 'analyst', 'data'],
-            'personality': ['personality', 'behavioral', 'behavior'],
-            'cognitive': ['cognitive', 'reasoning', 'verbal', 'numerical'],
-        }
-        
-        for skill, keywords in skill_keywords.items():
-            if any(kw in query_lower for kw in keywords):
-                requirements['skills'].append(skill)
+        requirements['skills'] = categorize(query_lower, SKILL_AUTOMATON)
         
         # Extract duration constraints
-        duration_patterns = [
-            r'(\d+)\s*(?:minutes?|mins?)',
-            r'(\d+)\s*(?:hours?|hrs?)',
-            r'(\d+)\s*-\s*(\d+)\s*(?:minutes?|mins?)',
-        ]
-        
-        for pattern in duration_patterns:
-            match = re.search(pattern, query_lower)
+        for pattern, is_range in DURATION_PATTERNS:
+            match = pattern.search(query_lower)
             if match:
-                if '-' in pattern:
+                if is_range:
                     requirements['duration_min'] = int(match.group(1))
                     requirements['duration_max'] = int(match.group(2))
                 else:
@@ -122,20 +122,29 @@ class RecommendationEngine:
     
     def recommend(self, query, top_k=10):
         """Recommend assessments for a query"""
-        # Preprocess query
-        processed_query = self.preprocess_text(query)
-        
+        return self.recommend_batch([query], top_k=top_k)[0]
+    
+    def recommend_batch(self, queries, top_k=10):
+        """Recommend assessments for many queries with one vectorize + similarity pass"""
+        # Preprocess and vectorize all queries at once
+        processed_queries = [self.preprocess_text(query) for query in queries]
+        query_vectors = self.vectorizer.transform(processed_queries)
+        
+        # Calculate cosine similarities (one row per query)
+        similarity_matrix = sparse_similarities(query_vectors, self.assessment_vectors)
+        
+        return [
+            self.rank_assessments(query, similarities, top_k)
+            for query, similarities in zip(queries, similarity_matrix)
+        ]
+    
+    def rank_assessments(self, query, similarities, top_k):
+        """Score, boost and balance assessments for one query given its similarity row"""
         # Extract requirements
         requirements = self.extract_requirements(query)
         
-        # Vectorize query
-        query_vector = self.vectorizer.transform([processed_query])
-        
-        # Calculate similarities
-        similarities = cosine_similarity(query_vector, self.assessment_vectors)[0]
-        
         # Get top candidates (more than needed)
-        top_indices = np.argsort(similarities)[::-1][:top_k * 3]
+        top_indices = top_k_indices(similarities, top_k * 3)
         
         # Score and filter candidates
         scored_assessments = []
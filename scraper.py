@@ -2,20 +2,70 @@
 SHL Product Catalog Scraper
 Crawls the SHL website to extract Individual Test Solutions
 """
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import httpx
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import lxml.html
+from lxml import etree
 import json
-import time
+import logging
+import orjson
+import os
 import re
 from urllib.parse import urljoin
+from html_text import stream_page, join_text
+from rate_limiter import RateLimiter
+from tqdm.asyncio import tqdm_asyncio
+
+# HTTP/2 multiplexes the concurrent product requests over one connection to shl.com
+try:
+    import h2
+    USE_HTTP2 = True
+except ImportError:
+    USE_HTTP2 = False
+
+logger = logging.getLogger(__name__)
+
+def load_jsonl(path):
+    """Yield the products saved in a JSON Lines file, one per line"""
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
 
 class SHLScraper:
-    def __init__(self):
+    # Compiled once, reused for every page; duration patterns are tried in priority order,
+    # each storing its `duration` group
+    _DURATION_PATTERNS = [
+        re.compile(r'(?P<duration>(\d+)\s*(?:minutes?|mins?))', re.IGNORECASE),
+        re.compile(r'(?P<duration>(\d+)\s*(?:hours?|hrs?))', re.IGNORECASE),
+        re.compile(r'(?P<duration>Duration[:\s]+(\d+))', re.IGNORECASE),
+    ]
+    _TEST_TYPE_RE = re.compile(r'Test Type[:\s]+([A-Z])')
+    # Compiled once; lxml filters the catalog links in C rather than per link in Python
+    _PRODUCT_HREFS = etree.XPath('//a[contains(@href, "/product-catalog/view/")]/@href')
+    
+    def __init__(self, keep_full_text=False, rps=5):
+        """
+        keep_full_text stores each page's whole text in the output (off: it dominates the JSON size).
+        rps caps product page requests per second across all concurrent fetches.
+        """
+        self.keep_full_text = keep_full_text
+        self.limiter = RateLimiter(rps)
         self.base_url = "https://www.shl.com/solutions/products/product-catalog/"
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        })
+        }
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Pooled keep-alive connections to shl.com, with retries on transient errors
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20, max_retries=Retry(
+            total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         
     def get_product_listing_page(self):
         """Fetch the main product catalog page"""
@@ -29,31 +79,59 @@ class SHLScraper:
     
     def extract_product_urls(self, html_content):
         """Extract all individual test solution URLs from the catalog"""
-        soup = BeautifulSoup(html_content, 'lxml')
+        tree = lxml.html.document_fromstring(html_content)
         product_urls = set()
         
-        # Find all links that point to product catalog items
-        links = soup.find_all('a', href=True)
-        
-        for link in links:
-            href = link['href']
-            # Match URLs that are individual product pages
-            if '/product-catalog/view/' in href:
-                full_url = urljoin(self.base_url, href)
-                # Clean the URL (remove fragments)
-                full_url = full_url.split('#')[0]
-                product_urls.add(full_url)
+        # Find all links that point to individual product pages
+        for href in self._PRODUCT_HREFS(tree):
+            full_url = urljoin(self.base_url, href)
+            # Clean the URL (remove fragments)
+            full_url = full_url.split('#')[0]
+            product_urls.add(full_url)
         
         print(f"Found {len(product_urls)} unique product URLs")
         return list(product_urls)
     
-    def scrape_product_details(self, url):
-        """Scrape details from an individual product page"""
+    async def fetch_product_page(self, client, semaphore, url):
+        """Fetch a product page as (content bytes, HTTP charset), at most `semaphore`-many requests in flight"""
         try:
-            time.sleep(0.5)  # Be respectful with requests
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'lxml')
+            async with semaphore:
+                await self.limiter.wait()  # Be respectful with requests
+                response = await client.get(url)
+                response.raise_for_status()
+                # Raw bytes: lxml decodes them itself, so the body is never decoded to str here
+                return response.content, response.charset_encoding
+        except Exception as e:
+            logger.warning(f"Error scraping {url}: {e}")
+            return None
+    
+    @staticmethod
+    def _is_detail_element(element):
+        """Elements parse_product_details reads: title, meta description, content areas, paragraphs"""
+        tag = element.tag
+        if tag in ('h1', 'p'):
+            return True
+        if tag == 'meta':
+            return element.get('name') == 'description'
+        if tag in ('div', 'section'):
+            css_class = element.get('class') or ''
+            return 'content' in css_class or 'description' in css_class or 'overview' in css_class
+        return False
+    
+    @classmethod
+    def _search_duration(cls, texts):
+        """First duration match, trying each text in turn and, within it, the patterns in priority order"""
+        for text in texts:
+            for pattern in cls._DURATION_PATTERNS:
+                match = pattern.search(text)
+                if match:
+                    return match
+        return None
+    
+    def parse_product_details(self, url, html, encoding=None):
+        """Extract details from an individual product page (HTML as str, or bytes in `encoding`)"""
+        try:
+            text_nodes, elements = stream_page(html, self._is_detail_element, encoding)
             
             # Extract product details
             product_data = {
@@ -63,34 +141,33 @@ class SHLScraper:
                 'test_type': '',
                 'duration': '',
                 'skills': [],
-                'category': '',
-                'full_text': ''
+                'category': ''
             }
             
             # Extract title/name
-            title = soup.find('h1')
-            if title:
-                product_data['name'] = title.get_text(strip=True)
+            titles = [texts for tag, _, texts in elements if tag == 'h1']
+            if titles:
+                product_data['name'] = join_text(titles[0], strip=True)
             
             # Extract description from various possible locations
             description_sections = []
             
             # Look for meta description
-            meta_desc = soup.find('meta', {'name': 'description'})
-            if meta_desc and meta_desc.get('content'):
-                description_sections.append(meta_desc['content'])
+            meta_desc = [attrib.get('content') for tag, attrib, _ in elements if tag == 'meta']
+            if meta_desc and meta_desc[0]:
+                description_sections.append(meta_desc[0])
             
             # Look for main content areas
-            content_divs = soup.find_all(['div', 'section'], class_=re.compile('content|description|overview'))
-            for div in content_divs:
-                text = div.get_text(strip=True)
+            content_divs = [texts for tag, _, texts in elements if tag in ('div', 'section')]
+            for texts in content_divs:
+                text = join_text(texts, strip=True)
                 if len(text) > 50:  # Only substantial text
                     description_sections.append(text)
             
             # Extract all paragraph text
-            paragraphs = soup.find_all('p')
-            for p in paragraphs:
-                text = p.get_text(strip=True)
+            paragraphs = [texts for tag, _, texts in elements if tag == 'p']
+            for texts in paragraphs:
+                text = join_text(texts, strip=True)
                 if len(text) > 30:
                     description_sections.append(text)
             
@@ -98,26 +175,21 @@ class SHLScraper:
             
             # Extract test type and other metadata
             # Look for duration information
-            duration_patterns = [
-                r'(\d+)\s*(?:minutes?|mins?)',
-                r'(\d+)\s*(?:hours?|hrs?)',
-                r'Duration[:\s]+(\d+)',
-            ]
-            
-            full_text = soup.get_text()
-            for pattern in duration_patterns:
-                match = re.search(pattern, full_text, re.IGNORECASE)
-                if match:
-                    product_data['duration'] = match.group(0)
-                    break
+            # (labels usually sit in the description, so the whole page is only searched on a miss)
+            full_text = join_text(text_nodes)
+            search_texts = (product_data['description'], full_text)
+            duration_match = self._search_duration(search_texts)
+            if duration_match:
+                product_data['duration'] = duration_match.group('duration')
             
             # Extract test type (K, P, etc.)
-            test_type_match = re.search(r'Test Type[:\s]+([A-Z])', full_text)
+            test_type_match = next(filter(None, map(self._TEST_TYPE_RE.search, search_texts)), None)
             if test_type_match:
                 product_data['test_type'] = test_type_match.group(1)
             
-            # Store full text for later use
-            product_data['full_text'] = full_text
+            # Store full text for later use, if requested
+            if self.keep_full_text:
+                product_data['full_text'] = full_text
             
             # Extract product name from URL as fallback
             if not product_data['name']:
@@ -128,11 +200,29 @@ class SHLScraper:
             return product_data
             
         except Exception as e:
-            print(f"Error scraping {url}: {e}")
+            logger.warning(f"Error scraping {url}: {e}")
             return None
     
-    def scrape_all_products(self, max_products=None):
-        """Main method to scrape all products"""
+    def parse_pages(self, urls, pages, max_workers=None):
+        """Parse fetched (content, charset) pages across CPU cores; yields a product dict or None per URL, in order"""
+        jobs = [i for i, page in enumerate(pages) if page is not None]
+        if not jobs:
+            yield from [None] * len(pages)
+            return
+        
+        # Parsing is pure CPU work, so processes sidestep the GIL; chunks amortize the IPC
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            parsed = executor.map(self.parse_product_details, [urls[i] for i in jobs],
+                                  [pages[i][0] for i in jobs], [pages[i][1] for i in jobs], chunksize=8)
+            for page in pages:
+                yield next(parsed) if page is not None else None
+    
+    def scrape_all_products(self, max_products=None, max_concurrency=10, jsonl_path='shl_products.jsonl'):
+        """
+        Main method to scrape all products.
+        If jsonl_path is given, each product is appended there as soon as it is parsed, and
+        products already saved there by an earlier (possibly interrupted) run are not scraped again.
+        """
         print("Starting SHL Product Catalog scraping...")
         
         # Get main page
@@ -147,21 +237,60 @@ class SHLScraper:
         if max_products:
             product_urls = product_urls[:max_products]
         
-        # Scrape each product
-        products = []
-        for i, url in enumerate(product_urls):
-            print(f"Scraping product {i+1}/{len(product_urls)}: {url}")
-            product_data = self.scrape_product_details(url)
-            if product_data:
-                products.append(product_data)
+        # Resume: skip products an earlier run already saved
+        saved = {}
+        if jsonl_path and os.path.exists(jsonl_path):
+            wanted = set(product_urls)
+            saved = {p['url']: p for p in load_jsonl(jsonl_path) if p['url'] in wanted}
+        remaining_urls = [url for url in product_urls if url not in saved]
+        
+        # Scrape the products concurrently
+        print(f"Scraping {len(remaining_urls)} products ({len(saved)} already saved)...")
+        scraped = asyncio.run(self.scrape_products_async(remaining_urls, max_concurrency, jsonl_path))
+        scraped = {p['url']: p for p in scraped}
+        products = [p for p in (saved.get(url) or scraped.get(url) for url in product_urls) if p]
         
         print(f"\nSuccessfully scraped {len(products)} products")
         return products
     
-    def save_to_json(self, products, filename='shl_products.json'):
-        """Save scraped data to JSON file"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(products, f, indent=2, ensure_ascii=False)
+    async def scrape_products_async(self, urls, max_concurrency=10, jsonl_path=None):
+        """
+        Fetch all product pages concurrently, then parse them in parallel, in URL order.
+        If jsonl_path is given, each product is appended there as soon as it is parsed.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        async with httpx.AsyncClient(http2=USE_HTTP2, limits=limits, timeout=30, headers=self.headers,
+                                     follow_redirects=True) as client:
+            tasks = [self.fetch_product_page(client, semaphore, url) for url in urls]
+            pages = await tqdm_asyncio.gather(*tasks, desc="Scraping")
+        
+        products = []
+        out = open(jsonl_path, 'ab') if jsonl_path else None
+        try:
+            for product_data in self.parse_pages(urls, pages):
+                if product_data:
+                    products.append(product_data)
+                    if out:
+                        out.write(orjson.dumps(product_data) + b'\n')
+                        out.flush()
+        finally:
+            if out:
+                out.close()
+        return products
+    
+    def save_to_json(self, products, filename='shl_products.json', pretty=False):
+        """Save scraped data to JSON file (compact and streamed one product at a time unless pretty)"""
+        with open(filename, 'wb') as f:
+            if pretty:
+                f.write(orjson.dumps(products, option=orjson.OPT_INDENT_2))
+            else:
+                f.write(b'[')
+                for i, product in enumerate(products):
+                    if i:
+                        f.write(b',')
+                    f.write(orjson.dumps(product))
+                f.write(b']')
         print(f"Saved {len(products)} products to {filename}")
 
 
@@ -2,28 +2,80 @@
 Targeted SHL Assessment Scraper
 Scrapes only the URLs from training data to build initial dataset
 """
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import aiohttp
+from aiohttp_client_cache import CachedSession, SQLiteBackend
 import json
-import time
+import logging
+import orjson
 import re
-import pandas as pd
+from urllib.parse import urlsplit, urlunsplit
+from categorize import categorize, TARGETED_CATEGORY_AUTOMATON
+from html_text import stream_page, join_text
+from load_data import load_sheet
+from rate_limiter import RateLimiter
+from tqdm.asyncio import tqdm_asyncio
+
+logger = logging.getLogger(__name__)
 
 class TargetedSHLScraper:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+    # Compiled once, reused for every page; duration patterns are tried in priority order,
+    # each storing its `duration` group
+    _DURATION_PATTERNS = [
+        re.compile(r'(?P<duration>(\d+)\s*(?:minutes?|mins?))', re.IGNORECASE),
+        re.compile(r'(?P<duration>(\d+)\s*(?:hours?|hrs?))', re.IGNORECASE),
+        re.compile(r'(?P<duration>(\d+\s*-\s*\d+)\s*(?:minutes?|mins?))', re.IGNORECASE),
+    ]
+    _TEST_TYPE_RE = re.compile(r'Test\s+Type[:\s]+([A-Z])', re.IGNORECASE)
+    
+    CACHE_EXPIRE_SECONDS = 7 * 24 * 3600  # Re-runs within a week are served from the on-disk HTTP cache
+    
+    def __init__(self, keep_full_text=True, rps=5, cache_name='shl_cache'):
+        """
+        keep_full_text stores each page's whole text in the output.
+        On by default: RecommendationEngine indexes it from assessments_data.json.
+        rps caps page requests per second across all concurrent fetches.
+        """
+        self.keep_full_text = keep_full_text
+        self.cache_name = cache_name
+        self.limiter = RateLimiter(rps)
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        })
+        }
+    
+    async def fetch_product_page(self, session, semaphore, url):
+        """Fetch a product page as (content bytes, HTTP charset), at most `semaphore`-many requests in flight"""
+        try:
+            async with semaphore:
+                await self.limiter.wait()  # Be respectful
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                    response.raise_for_status()
+                    # Raw bytes: lxml decodes them itself, so the body is never decoded to str here
+                    return await response.read(), response.charset
+        except Exception as e:
+            logger.warning(f"Error scraping {url}: {e}")
+            return None
+    
+    @staticmethod
+    def _is_detail_element(element):
+        """Elements parse_product_details reads: title and meta description"""
+        return element.tag == 'h1' or (element.tag == 'meta' and element.get('name') == 'description')
+    
+    @classmethod
+    def _search_duration(cls, texts):
+        """First duration match, trying each text in turn and, within it, the patterns in priority order"""
+        for text in texts:
+            for pattern in cls._DURATION_PATTERNS:
+                match = pattern.search(text)
+                if match:
+                    return match
+        return None
     
-    def scrape_product_details(self, url):
-        """Scrape details from an individual product page"""
+    def parse_product_details(self, url, html, encoding=None):
+        """Extract details from an individual product page (HTML as str, or bytes in `encoding`)"""
         try:
-            print(f"Scraping: {url}")
-            time.sleep(0.3)  # Be respectful
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'lxml')
+            text_nodes, elements = stream_page(html, self._is_detail_element, encoding)
             
             # Extract product details
             product_data = {
@@ -33,14 +85,13 @@ class TargetedSHLScraper:
                 'test_type': '',
                 'duration': '',
                 'category': '',
-                'skills': [],
-                'full_text': ''
+                'skills': []
             }
             
             # Extract title/name
-            title = soup.find('h1')
-            if title:
-                product_data['name'] = title.get_text(strip=True)
+            titles = [texts for tag, _, texts in elements if tag == 'h1']
+            if titles:
+                product_data['name'] = join_text(titles[0], strip=True)
             
             # Fallback: extract name from URL
             if not product_data['name']:
@@ -50,83 +101,110 @@ class TargetedSHLScraper:
                     product_data['name'] = name.replace('-', ' ').title()
             
             # Extract meta description
-            meta_desc = soup.find('meta', {'name': 'description'})
-            if meta_desc and meta_desc.get('content'):
-                product_data['description'] = meta_desc['content']
+            meta_desc = [attrib.get('content') for tag, attrib, _ in elements if tag == 'meta']
+            if meta_desc and meta_desc[0]:
+                product_data['description'] = meta_desc[0]
             
             # Get all text content
-            full_text = soup.get_text(separator=' ', strip=True)
-            product_data['full_text'] = full_text
+            full_text = join_text(text_nodes, separator=' ', strip=True)
+            if self.keep_full_text:
+                product_data['full_text'] = full_text
             
-            # Extract duration
-            duration_patterns = [
-                r'(\d+)\s*(?:minutes?|mins?)',
-                r'(\d+)\s*(?:hours?|hrs?)',
-                r'(\d+\s*-\s*\d+)\s*(?:minutes?|mins?)',
-            ]
-            
-            for pattern in duration_patterns:
-                match = re.search(pattern, full_text, re.IGNORECASE)
-                if match:
-                    product_data['duration'] = match.group(0)
-                    break
+            # Extract duration, from the description first and the whole page only on a miss
+            search_texts = (product_data['description'], full_text)
+            duration_match = self._search_duration(search_texts)
+            if duration_match:
+                product_data['duration'] = duration_match.group('duration')
             
             # Extract test type
-            test_type_match = re.search(r'Test\s+Type[:\s]+([A-Z])', full_text, re.IGNORECASE)
+            test_type_match = next(filter(None, map(self._TEST_TYPE_RE.search, search_texts)), None)
             if test_type_match:
                 product_data['test_type'] = test_type_match.group(1)
             
-            # Extract category keywords
-            categories = []
-            category_keywords = {
-                'programming': ['java', 'python', 'javascript', 'programming', 'coding', 'software', 'developer'],
-                'personality': ['personality', 'behavior', 'opq', 'behavioral'],
-                'cognitive': ['cognitive', 'verbal', 'numerical', 'reasoning', 'inductive'],
-                'sales': ['sales', 'selling', 'customer'],
-                'leadership': ['leadership', 'manager', 'executive', 'coo'],
-                'communication': ['communication', 'english', 'writing', 'interpersonal'],
-                'technical': ['technical', 'sql', 'database', 'selenium', 'html', 'css'],
-                'administrative': ['administrative', 'admin', 'clerical']
-            }
-            
-            text_lower = full_text.lower()
-            for category, keywords in category_keywords.items():
-                if any(keyword in text_lower or keyword in product_data['name'].lower() for keyword in keywords):
-                    categories.append(category)
+            # Extract category keywords from page text and name in one scan
+            # (keywords never contain a newline, so no match spans the two)
+            text_lower = f"{full_text}\n{product_data['name']}".lower()
+            categories = categorize(text_lower, TARGETED_CATEGORY_AUTOMATON)
             
             product_data['category'] = ', '.join(categories) if categories else 'general'
             
             return product_data
             
         except Exception as e:
-            print(f"Error scraping {url}: {e}")
+            logger.warning(f"Error scraping {url}: {e}")
             return None
     
-    def scrape_from_training_data(self, excel_path):
+    def parse_pages(self, urls, pages, max_workers=None):
+        """Parse fetched (content, charset) pages across CPU cores; yields a product dict or None per URL, in order"""
+        jobs = [i for i, page in enumerate(pages) if page is not None]
+        if not jobs:
+            yield from [None] * len(pages)
+            return
+        
+        # Parsing is pure CPU work, so processes sidestep the GIL; chunks amortize the IPC
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            parsed = executor.map(self.parse_product_details, [urls[i] for i in jobs],
+                                  [pages[i][0] for i in jobs], [pages[i][1] for i in jobs], chunksize=8)
+            for page in pages:
+                yield next(parsed) if page is not None else None
+    
+    @staticmethod
+    def canonical_url(url):
+        """Drop the fragment, lowercase scheme and host, and end the path with '/' like catalog URLs do"""
+        parts = urlsplit(url.strip())
+        path = parts.path if parts.path.endswith('/') else parts.path + '/'
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+    
+    async def scrape_urls_async(self, urls, max_concurrency=10):
+        """Fetch all pages concurrently; returns (content bytes, HTTP charset) or None per URL, in order"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        connector = aiohttp.TCPConnector(limit=max_concurrency, ttl_dns_cache=300)
+        # Same page cache as full_scraper.py, so either scraper's runs warm it for the other
+        cache = SQLiteBackend(f'{self.cache_name}_pages.sqlite', expire_after=self.CACHE_EXPIRE_SECONDS)
+        async with CachedSession(cache=cache, connector=connector, headers=self.headers) as session:
+            tasks = [self.fetch_product_page(session, semaphore, url) for url in urls]
+            return await tqdm_asyncio.gather(*tasks, desc="Scraping")
+    
+    def scrape_from_training_data(self, excel_path, max_concurrency=10):
         """Scrape all URLs from training data"""
-        # Load training data
-        df_train = pd.read_excel(excel_path, sheet_name='Train-Set')
-        unique_urls = df_train['Assessment_url'].unique()
+        # Load only the URL column of the training data
+        df_train = load_sheet(excel_path, 'Train-Set', usecols=['Assessment_url'])
+        # Spellings of the same page (fragment, host case, trailing slash) are fetched once, by their
+        # canonical URL; records keep the URL as written so they still match the ground truth
+        urls = df_train['Assessment_url'].dropna()
+        canonical_urls = urls.map(self.canonical_url)
+        first_spelling = ~canonical_urls.duplicated()
+        unique_urls = urls[first_spelling].tolist()
+        fetch_urls = canonical_urls[first_spelling].tolist()
         
         print(f"Found {len(unique_urls)} unique URLs to scrape")
+        pages = asyncio.run(self.scrape_urls_async(fetch_urls, max_concurrency))
+        
+        parsed = self.parse_pages(unique_urls, pages)
         
         products = []
-        for i, url in enumerate(unique_urls):
-            print(f"\n[{i+1}/{len(unique_urls)}]")
-            product_data = self.scrape_product_details(url)
+        for url, product_data in zip(unique_urls, parsed):
             if product_data:
                 products.append(product_data)
-                print(f"✓ Scraped: {product_data['name']}")
+                logger.debug(f"✓ Scraped: {product_data['name']}")
             else:
-                print(f"✗ Failed to scrape")
+                logger.warning(f"✗ Failed to scrape {url}")
         
-        print(f"\n\nSuccessfully scraped {len(products)} products")
+        print(f"\nSuccessfully scraped {len(products)} products")
         return products
     
-    def save_to_json(self, products, filename='assessments_data.json'):
-        """Save scraped data to JSON file"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(products, f, indent=2, ensure_ascii=False)
+    def save_to_json(self, products, filename='assessments_data.json', pretty=False):
+        """Save scraped data to JSON file (compact and streamed one product at a time unless pretty)"""
+        with open(filename, 'wb') as f:
+            if pretty:
+                f.write(orjson.dumps(products, option=orjson.OPT_INDENT_2))
+            else:
+                f.write(b'[')
+                for i, product in enumerate(products):
+                    if i:
+                        f.write(b',')
+                    f.write(orjson.dumps(product))
+                f.write(b']')
         print(f"Saved {len(products)} products to {filename}")
 
 
@@ -140,7 +218,7 @@ def main():
     products = scraper.scrape_from_training_data(excel_path)
     
     if products:
-        scraper.save_to_json(products, 'assessments_data.json')
+        scraper.save_to_json(products, 'assessments_data.json', pretty=True)
         print("\n" + "="*50)
         print("Sample product:")
         print(json.dumps(products[0], indent=2))
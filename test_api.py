@@ -4,12 +4,16 @@ Test the Flask API endpoints
 import requests
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# One session shared by all calls (and worker threads), so connections to the server are kept alive and reused
+SESSION = requests.Session()
 
 def test_health():
     """Test the health endpoint"""
     print("Testing /health endpoint...")
     try:
-        response = requests.get('http://localhost:5000/health')
+        response = SESSION.get('http://localhost:5000/health')
         print(f"Status Code: {response.status_code}")
         print(f"Response: {json.dumps(response.json(), indent=2)}")
         return response.status_code == 200
@@ -17,8 +21,20 @@ def test_health():
         print(f"Error: {e}")
         return False
 
-def test_recommend():
-    """Test the recommend endpoint"""
+def post_recommend(query):
+    """POST one query to the recommend endpoint"""
+    payload = {
+        "query": query,
+        "top_k": 5
+    }
+    return SESSION.post(
+        'http://localhost:5000/recommend',
+        json=payload,
+        headers={'Content-Type': 'application/json'}
+    )
+
+def test_recommend(max_workers=8):
+    """Test the recommend endpoint, sending the queries concurrently"""
     print("\n\nTesting /recommend endpoint...")
     
     test_queries = [
@@ -27,38 +43,34 @@ def test_recommend():
         "Entry level sales position"
     ]
     
-    for query in test_queries:
-        print(f"\n{'='*80}")
-        print(f"Query: {query}")
-        print('='*80)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(post_recommend, query): query for query in test_queries}
         
-        try:
-            payload = {
-                "query": query,
-                "top_k": 5
-            }
-            
-            response = requests.post(
-                'http://localhost:5000/recommend',
-                json=payload,
-                headers={'Content-Type': 'application/json'}
-            )
+        # Report each query as soon as its response arrives
+        for future in as_completed(futures):
+            print(f"\n{'='*80}")
+            print(f"Query: {futures[future]}")
+            print('='*80)
             
-            print(f"Status Code: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                print(f"\nRecommendations:")
-                for i, rec in enumerate(data['recommendations'], 1):
-                    print(f"{i}. {rec['assessment_name']}")
-                    print(f"   {rec['assessment_url']}")
-            else:
-                print(f"Error: {response.text}")
+            try:
+                response = future.result()
+                print(f"Status Code: {response.status_code}")
                 
-        except Exception as e:
-            print(f"Error: {e}")
-        
-        time.sleep(0.5)
+                if response.status_code == 200:
+                    data = response.json()
+                    print(f"\nRecommendations:")
+                    for i, rec in enumerate(data['recommended_assessments'], 1):
+                        print(f"{i}. {rec['name']}")
+                        print(f"   {rec['url']}")
+                else:
+                    print(f"Error: {response.text}")
+                    
+            except Exception as e:
+                print(f"Error: {e}")
+    
+    elapsed = time.perf_counter() - start
+    print(f"\n{len(test_queries)} queries in {elapsed:.2f}s ({len(test_queries) / elapsed:.1f} queries/s)")
 
 if __name__ == "__main__":
     print("="*80)
@@ -0,0 +1,62 @@
+"""
+Similarity kernels for the TF-IDF retrieval path, and top-k selection shared by both engines
+Rows of the TF-IDF matrix are L2-normalized, so cosine similarity is a dot product
+"""
+import numpy as np
+
+# Numba JIT-compiles the kernel; without it scipy's sparse matmul is used instead
+try:
+    from numba import njit
+    USE_NUMBA = True
+except ImportError:
+    USE_NUMBA = False
+
+
+if USE_NUMBA:
+    # Serial on purpose: requests already run on many threads, and numba's parallel
+    # workqueue layer (used when neither TBB nor OpenMP is present) aborts on concurrent calls
+    @njit(cache=True)
+    def sparse_dot_rows(query_dense, data, indices, indptr, out):
+        """out[i] = X[i] . query for a CSR matrix X given as (data, indices, indptr)"""
+        for i in range(indptr.shape[0] - 1):
+            acc = 0.0
+            for j in range(indptr[i], indptr[i + 1]):
+                acc += data[j] * query_dense[indices[j]]
+            out[i] = acc
+
+
+def sparse_similarities(query_vectors, matrix, out=None):
+    """
+    Cosine similarities between L2-normalized sparse query rows and the rows of `matrix` (CSR).
+    Returns a dense (num_queries, num_rows) array, written into `out` when given.
+    """
+    if not USE_NUMBA:
+        if out is None:
+            return (query_vectors @ matrix.T).toarray()
+        out[:] = (query_vectors @ matrix.T).toarray()
+        return out
+
+    num_queries, num_features = query_vectors.shape
+    similarities = out
+    if similarities is None:
+        similarities = np.empty((num_queries, matrix.shape[0]), dtype=matrix.dtype)
+    query_dense = np.zeros(num_features, dtype=matrix.dtype)
+    for q in range(num_queries):
+        start, end = query_vectors.indptr[q], query_vectors.indptr[q + 1]
+        cols = query_vectors.indices[start:end]
+        query_dense[cols] = query_vectors.data[start:end]
+        sparse_dot_rows(query_dense, matrix.data, matrix.indices, matrix.indptr, similarities[q])
+        query_dense[cols] = 0
+    return similarities
+
+
+def top_k_indices(scores, top_k):
+    """Indices of the top_k highest scores, best first (O(N) partition + sort of k)"""
+    k = min(top_k, scores.shape[-1])
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+    # Keep everything tied with the k-th best score, then order just those candidates
+    kth_best = np.partition(scores, scores.shape[-1] - k)[scores.shape[-1] - k]
+    top = np.flatnonzero(scores >= kth_best)
+    # Ties go to the higher index, as with the previous argsort(scores)[::-1]
+    return top[np.lexsort((-top, -scores[top]))[:k]]